@@ -9,12 +9,66 @@ def _():
     import marimo as mo
     import pandas as pd
     import numpy as np
-    import statsmodels.formula.api as smf
-    import pyarrow as pa
-    import seaborn as sns
     import matplotlib.pyplot as plt
+    from didid import (
+        IncrementalFit,
+        REPLICATES,
+        ResultCache,
+        SpecGrid,
+        WEIGHT,
+        absorbed_glm,
+        cached_ols_many,
+        cached_panel_cells,
+        cached_table,
+        compact_frame,
+        footprint,
+        jackknife_summary,
+        jackknife_table,
+        load_dta_cached,
+        memory_report,
+        panel_table,
+        permutation_table,
+        point_panels,
+        survey_fit,
+        threshold_table,
+        wild_bootstrap_table,
+    )
+
+    return (
+        IncrementalFit,
+        REPLICATES,
+        ResultCache,
+        SpecGrid,
+        WEIGHT,
+        absorbed_glm,
+        cached_ols_many,
+        cached_panel_cells,
+        cached_table,
+        compact_frame,
+        footprint,
+        jackknife_summary,
+        jackknife_table,
+        load_dta_cached,
+        memory_report,
+        mo,
+        np,
+        panel_table,
+        pd,
+        permutation_table,
+        plt,
+        point_panels,
+        survey_fit,
+        threshold_table,
+        wild_bootstrap_table,
+    )
+
 
-    return mo, np, pd, plt, smf, sns
+@app.cell
+def _(ResultCache):
+    # On-disk cache of fitted models, keyed by a fingerprint of the data plus the formula, sample and
+    # clustering, so reopening the notebook or editing unrelated cells restores results instead of refitting
+    result_cache = ResultCache()
+    return (result_cache,)
 
 
 @app.cell(hide_code=True)
@@ -94,20 +148,28 @@ def _(mo):
 
 
 @app.cell
-def _(np, pd):
+def _(REPLICATES, WEIGHT, compact_frame, footprint, load_dta_cached, memory_report):
     #1. Load the data
-    df = pd.read_stata('maternal_employment.dta', convert_categoricals=True)
-
-
+    # The first run converts the .dta into a cleaned Arrow cache (.didid_cache/) keyed by the file's hash;
+    # later runs memory-map that cache and only read the columns the models use
     #2. Filter: Keep only White mothers (Race != 2 means dropping Black mothers)
     # This matches line 12 of your original Stata do-file
-    df = df[df['race'] != 2].copy()
-
     #3. Clean Missing Values: Replace 'N/A' strings with actual NaNs
-    df = df.replace('N/A', np.nan)
-
-    #4. Verify the data loaded
+    # (steps 2 and 3 live in didid.ingest.clean_frame and are baked into the cache)
+    # Person and replicate weights are read too when the extract carries them
+    _loaded = load_dta_cached('maternal_employment.dta', optional=[WEIGHT, *REPLICATES])
+
+    #4. Compact the frame: categorical state/age codes, int8 flags and float32 hours
+    # (each cast is only made when no value changes, so every estimate is unchanged)
+    # Only the per-column footprint of the loaded frame is kept for the report, so the
+    # uncompacted frame is released right away instead of living next to df
+    _before = footprint(_loaded)
+    df = compact_frame(_loaded)
+    del _loaded
+
+    #5. Verify the data loaded
     print(f"Data loaded successfully: {len(df)} observations ready for analysis.")
+    print(memory_report(_before, df).round(3).to_string())
     df.head(10)
     return (df,)
 
@@ -118,12 +180,15 @@ def _(df, np, pd):
 
     #Part-Time Likelihood: 1 if 1-34 hours, 0 if 35+ hours
     #We only calculate this for workers in the next step
-    df['part_time'] = np.where((df['HRSWORK1'] >= 1) & (df['HRSWORK1'] <= 34), 1, 0)
+    df['part_time'] = ((df['HRSWORK1'] >= 1) & (df['HRSWORK1'] <= 34)).astype('int8')
 
 
     #Categorize states based on the 'rlanham_012' column identified in file
     median_val = df['rlanham_012'].median()
-    df['high_lanham'] = np.where(df['rlanham_012'] > median_val, 'High Spending', 'Low Spending')
+    df['high_lanham'] = pd.Categorical(
+        np.where(df['rlanham_012'] > median_val, 'High Spending', 'Low Spending'),
+        categories=['Low Spending', 'High Spending'],
+    )
     return
 
 
@@ -186,23 +251,22 @@ def _(mo):
 
 
 @app.cell
-def _(df, smf):
+def _(cached_ols_many, df, result_cache):
     df['treat_post_cont'] = df['treated'] * df['post']
     df['treat_lanham_cont'] = df['treated'] * df['rlanham_012']
     df['post_lanham_cont'] = df['post'] * df['rlanham_012']
     df['ddd_cont'] = df['treated'] * df['post'] * df['rlanham_012']
 
     # Formula using continuous lanham variable with fixed effects
+    # C(statefip) and C(age) are absorbed (demeaned out) rather than expanded into dummy columns
     formula = "rlanham_012 + post + treat_post_cont + treat_lanham_cont + post_lanham_cont + ddd_cont + C(statefip) + C(age)"
 
     # Regression 1: Likelihood of being employed (Extensive Margin)
-    model_paper_emp = smf.ols(f"emp ~ {formula}", data=df).fit(
-        cov_type='cluster', cov_kwds={'groups': df['statefip']}
-    )
-
     # Regression 2: Number of hours worked (Intensive Margin - Unconditional)
-    model_paper_hours = smf.ols(f"HRSWORK1 ~ {formula}", data=df).fit(
-        cov_type='cluster', cov_kwds={'groups': df['statefip']}
+    # Both share one right-hand side and sample, so the design is built and factorized once
+    # Results are cached on disk (.didid_cache/results) keyed by the data, formula and sample
+    model_paper_emp, model_paper_hours = cached_ols_many(
+        result_cache, ['emp', 'HRSWORK1'], formula, data=df, cluster='statefip'
     )
 
     print("Original Paper Replication Complete.")
@@ -257,21 +321,19 @@ def _(mo):
 
 
 @app.cell(hide_code=True)
-def _(df, formula, smf):
-    #1. Filter to mothers WHO ARE ALREADY EMPLOYED 
-    df_workers = df[df['emp'] == 1].copy()
+def _(cached_ols_many, df, formula, result_cache):
+    #1. Restrict to mothers WHO ARE ALREADY EMPLOYED
+    # (applied as a row mask inside the fit, so the frame is not copied)
+    workers = 'emp == 1'
 
     #2. Run the same DiDiD model as before, but on the CONDITIONAL sample
-    model_my_pt = smf.ols(f"part_time ~ {formula}", data=df_workers).fit(
-        cov_type='cluster', cov_kwds={'groups': df_workers['statefip']}
-    )
-
-    model_my_hours = smf.ols(f"HRSWORK1 ~ {formula}", data=df_workers).fit(
-        cov_type='cluster', cov_kwds={'groups': df_workers['statefip']}
+    model_my_pt, model_my_hours = cached_ols_many(
+        result_cache, ['part_time', 'HRSWORK1'], formula, data=df,
+        cluster='statefip', sample=workers
     )
 
     print("Extension Analysis (Employed Mothers Only) Complete.")
-    return model_my_hours, model_my_pt
+    return model_my_hours, model_my_pt, workers
 
 
 @app.cell
@@ -330,6 +392,133 @@ def _(model_my_hours, model_my_pt, model_paper_emp, model_paper_hours):
     return
 
 
+@app.cell
+def _(cached_table, df, formula, result_cache, wild_bootstrap_table):
+    # With only 48 state clusters the asymptotic clustered p-values can be too optimistic,
+    # so check ddd_cont with a wild cluster restricted bootstrap (null imposed, Rademacher weights)
+    # Cached like the fits: only a change to the columns it reads, reps or seed reruns it
+    boot_table = cached_table(result_cache, wild_bootstrap_table, df, formula=formula,
+                              reps=9999, seed=1940)
+    boot_table
+    return
+
+
+@app.cell
+def _(cached_table, df, formula, permutation_table, result_cache):
+    # Randomization inference: reassign the 48 state spending levels at random and refit,
+    # giving a placebo distribution for ddd_cont that does not rely on clustered SEs at all
+    perm_table = cached_table(result_cache, permutation_table, df, formula=formula,
+                              reps=9999, seed=1943)
+    perm_table
+    return
+
+
+@app.cell
+def _(df, formula, jackknife_summary, jackknife_table):
+    # Leave-one-state-out jackknife: is the Lanham effect driven by any single state?
+    # Column order matches the comparison table above (1-4); se_cv3 is the jackknife SE
+    loo_table = jackknife_table(df, formula=formula)
+    jackknife_summary(loo_table)
+    return
+
+
+@app.cell
+def _(absorbed_glm, df, formula, model_my_pt, model_paper_emp, pd, workers):
+    # emp and part_time are binary, so re-estimate Models 1 & 3 as fixed-effects logits.
+    # In a logit the ddd_cont coefficient (or its dy/dx) is not the triple-interaction effect,
+    # so compare the interaction effect instead: the average change in the predicted probability
+    # of treated mothers in 1950 when ddd_cont is switched off, per $ of Lanham spending
+    logit_emp = absorbed_glm(f"emp ~ {formula}", df, link='logit', cluster='statefip')
+    logit_pt = absorbed_glm(f"part_time ~ {formula}", df, link='logit', cluster='statefip', sample=workers)
+    pd.DataFrame({
+        name: {'LPM coef': lpm.params['ddd_cont'], 'LPM SE': lpm.bse['ddd_cont'],
+               'logit effect per $': logit.interaction.loc['per unit', 'effect'],
+               'logit SE': logit.interaction.loc['per unit', 'Std.Err.']}
+        for name, lpm, logit in [('1 (emp)', model_paper_emp, logit_emp),
+                                 ('3 (part_time)', model_my_pt, logit_pt)]
+    })
+    return
+
+
+@app.cell
+def _(SpecGrid, df):
+    # Robustness grid: outcome x sample x FE set (adding state x year) x treatment (continuous vs
+    # high_lanham) x clustering level (state, state x year, two-way state and age), with the
+    # choices defined in didid/spec.py. Each sample x treatment x FE set is demeaned once and
+    # the sample x treatment pairs are fit on a process pool.
+    # emp is constant among workers, so that pairing is skipped
+    spec_grid = SpecGrid(
+        ['emp', 'HRSWORK1', 'part_time'],
+        exclude=lambda outcome, sample, *_: outcome == 'emp' and sample == 'workers',
+    )
+    spec_results = spec_grid.run(df, n_jobs=4)
+    spec_results.save('.didid_cache/spec_grid.arrow')
+    spec_results.table(fixed_effects='state+age+state_year', treatment='high_lanham', cluster='statefip')
+    return (spec_results,)
+
+
+@app.cell
+def _(plt, spec_results):
+    # Specification curve of the employment DiDiD coefficient across the grid
+    spec_results.curve('ddd_cont', outcome='emp')
+    plt.show()
+    return
+
+
+@app.cell
+def _(REPLICATES, WEIGHT, df, mo, survey_fit):
+    # Survey-weighted versions of the four models: person weights for the estimates and
+    # successive-difference replicate weights (4/80 * sum of squared deviations) for the SEs.
+    # All replicates of a sample are solved in one batched pass over the data
+    _replicates = [c for c in REPLICATES if c in df.columns]
+    if WEIGHT in df.columns and _replicates:
+        from statsmodels.iolib.summary2 import summary_col as _summary_col
+        _models = survey_fit(df, replicates=_replicates)
+        _table = _summary_col(list(_models.values()), stars=True, float_format='%0.5f',
+                              model_names=['1', '2', '3', '4'], regressor_order=['ddd_cont'],
+                              drop_omitted=True)
+        _table.add_title('Person-weighted DiDiD with replicate-weight standard errors')
+        _out = mo.plain_text(_table.as_text())
+    else:
+        _out = mo.md(f"The extract has no `{WEIGHT}`/replicate weight columns; survey-weighted fits skipped.")
+    _out
+    return
+
+
+@app.cell
+def _(IncrementalFit, df):
+    # Store the per-state cross-products of the four models so that a later census wave or a
+    # newly cleaned state extract can be folded in without re-reading this one:
+    #   IncrementalFit.load('.didid_cache/incremental.npz').add(new_rows, label='1960')
+    # The fit from the stored blocks reproduces the comparison table's estimates and SEs
+    panel_state = IncrementalFit().add(df, label='1940-1950')
+    panel_state.save('.didid_cache/incremental.npz')
+    panel_state.table()
+    return
+
+
+@app.cell
+def _(df, plt, threshold_table):
+    # Dose-response: binary-treatment DiDiD (spending above a cutoff) at every state spending cutoff,
+    # instead of only the median split behind high_lanham. Each cutoff moves one state to the control
+    # group, so the sweep updates per-state sufficient statistics rather than refitting
+    threshold_curve = threshold_table(df)
+
+    _fig, _axes = plt.subplots(1, 4, figsize=(16, 3.5), sharex=True)
+    for _ax, (_model, _rows) in zip(_axes, threshold_curve.groupby('model', sort=False)):
+        _ax.fill_between(_rows['cutoff'], _rows['coef'] - 1.96 * _rows['se'],
+                         _rows['coef'] + 1.96 * _rows['se'], alpha=0.3)
+        _ax.plot(_rows['cutoff'], _rows['coef'], marker='o', ms=3)
+        _ax.axhline(0, color='k', lw=0.8)
+        _ax.axvline(df['rlanham_012'].median(), color='grey', ls='--', lw=0.8)
+        _ax.set_title(_model)
+        _ax.set_xlabel('rlanham_012 cutoff')
+    _axes[0].set_ylabel('ddd_cont (95% CI)')
+    _fig.suptitle('DiDiD effect of high Lanham spending by cutoff (dashed: median split)', y=1.02)
+    plt.show()
+    return
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(r"""
@@ -339,81 +528,25 @@ def _(mo):
 
 
 @app.cell(hide_code=True)
-def _(df, np, pd, plt, sns):
-    # 1. Prepare visualization dataset
-    viz_df = df.copy()
-    viz_df['Period'] = np.where(viz_df['post'] == 1, '1950 (Post)', '1940 (Pre)')
-    viz_df['Group'] = np.where(viz_df['treated'] == 1, 'Treated (Mothers)', 'Control')
-
-    # 2. Create spending quartiles using pd.cut - MUCH SIMPLER
-    viz_df['lanham_quartile'] = pd.qcut(
-        viz_df['rlanham_012'], 
-        q=4, 
-        labels=['Q1: Low Spending', 'Q2: Medium-Low', 'Q3: Medium-High', 'Q4: High Spending']
-    )
+def _(cached_panel_cells, df, panel_table, plt, point_panels, result_cache):
+    # 1. One grouped pass over the data: counts, sums and sums of squares per state x treated x post
+    #    cell for each outcome and sample (cached next to the fitted models)
+    viz_cells = cached_panel_cells(result_cache, df)
+
+    # 2. Means and 95% CIs per Period x Group x spending quartile (row-level quartiles, as pd.qcut)
+    viz_table = panel_table(viz_cells)
 
     # REGRESSION 1: Employment Probability
-    g1 = sns.catplot(
-        data=viz_df, 
-        x='Period', 
-        y='emp', 
-        hue='Group', 
-        col='lanham_quartile',
-        kind='point', 
-        capsize=0.1, 
-        palette='Set1', 
-        height=4, 
-        aspect=0.8
-    )
-    g1.fig.suptitle('DiDiD: Employment Probability by Lanham Spending Quartile', y=1.02)
+    g1 = point_panels(viz_table, 'paper_emp', 'DiDiD: Employment Probability by Lanham Spending Quartile', palette='Set1')
 
     # REGRESSION 2: Weekly Hours
-    g2 = sns.catplot(
-        data=viz_df, 
-        x='Period', 
-        y='HRSWORK1', 
-        hue='Group', 
-        col='lanham_quartile',
-        kind='point', 
-        capsize=0.1, 
-        palette='Set1', 
-        height=4, 
-        aspect=0.8
-    )
-    g2.fig.suptitle('DiDiD: Weekly Hours by Lanham Spending Quartile', y=1.02)
-
-    # Workers only
-    worker_viz_df = viz_df[viz_df['emp'] == 1].copy()
-
-    # REGRESSION 3: Part-Time Probability
-    g3 = sns.catplot(
-        data=worker_viz_df, 
-        x='Period', 
-        y='part_time', 
-        hue='Group', 
-        col='lanham_quartile',
-        kind='point', 
-        capsize=0.1, 
-        palette='Set2', 
-        height=4, 
-        aspect=0.8
-    )
-    g3.fig.suptitle('DiDiD: Part-Time Probability (Workers Only)', y=1.02)
+    g2 = point_panels(viz_table, 'paper_hours', 'DiDiD: Weekly Hours by Lanham Spending Quartile', palette='Set1')
+
+    # REGRESSION 3: Part-Time Probability (Workers Only)
+    g3 = point_panels(viz_table, 'my_pt', 'DiDiD: Part-Time Probability (Workers Only)', palette='Set2')
 
     # REGRESSION 4: Weekly Hours (Workers Only)
-    g4 = sns.catplot(
-        data=worker_viz_df, 
-        x='Period', 
-        y='HRSWORK1', 
-        hue='Group', 
-        col='lanham_quartile',
-        kind='point', 
-        capsize=0.1, 
-        palette='Set2', 
-        height=4, 
-        aspect=0.8
-    )
-    g4.fig.suptitle('DiDiD: Weekly Hours (Workers Only)', y=1.02)
+    g4 = point_panels(viz_table, 'my_hours', 'DiDiD: Weekly Hours (Workers Only)', palette='Set2')
 
     plt.show()
     return
@@ -514,4 +647,11 @@ def _():
 
 
 if __name__ == "__main__":
+    import sys
+
+    if "--batch" in sys.argv[1:]:
+        # Headless pipeline for batch nodes: see didid/batch.py for the options
+        from didid.batch import main
+
+        sys.exit(main(sys.argv[1:]))
     app.run()
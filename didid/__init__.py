@@ -0,0 +1,101 @@
+"""Estimation helpers for the Lanham Act DiDiD notebook (didid-regression.py)."""
+
+from .absorb import AbsorbedDesign, FixedEffects, absorbed_ols, absorbed_ols_many, parse_formula
+from .bootstrap import WildClusterBootstrap, wild_bootstrap_table
+from .cache import (ResultCache, cached_collapse, cached_ols_many, cached_panel_cells,
+                    cached_table, fingerprint)
+from .collapse import CELL_KEYS, collapse, collapse_models, collapsed_fit, collapsed_ols
+from .glm import BinaryFEResults, absorbed_glm
+from .grid import SpecGrid, SpecResults
+from .ingest import (MODEL_COLUMNS, SCHEMA, clean_frame, compact_frame, footprint, load_dta_cached,
+                     memory_report)
+from .incremental import IncrementalFit
+from .jackknife import jackknife_summary, jackknife_table
+from .lazy import collect_features, lazy_fit
+from .moments import ClusterMoments
+from .permutation import PermutationInference, permutation_table
+from .plots import PANEL_KEYS, panel_cells, panel_table, point_panels
+from .results import DiDiDResults
+from .spec import (CLUSTER, CLUSTERS, FE_SETS, FORMULA, LANHAM_TERMS, MODELS, REPLICATES,
+                   SAMPLES, TREATMENTS, WEIGHT)
+from .stream import add_features, iter_arrow_chunks, iter_dta_chunks, stream_fit, stream_moments
+from .survey import survey_fit, survey_ols_many
+from .synthetic import PLANTED, synthetic_census, synthetic_chunks, write_synthetic_dta
+from .threshold import ThresholdSweep, threshold_table
+
+__all__ = [
+    'AbsorbedDesign',
+    'BinaryFEResults',
+    'CELL_KEYS',
+    'CLUSTER',
+    'CLUSTERS',
+    'ClusterMoments',
+    'DiDiDResults',
+    'FE_SETS',
+    'FORMULA',
+    'FixedEffects',
+    'IncrementalFit',
+    'LANHAM_TERMS',
+    'MODELS',
+    'MODEL_COLUMNS',
+    'PANEL_KEYS',
+    'PLANTED',
+    'PermutationInference',
+    'REPLICATES',
+    'ResultCache',
+    'SAMPLES',
+    'SCHEMA',
+    'SpecGrid',
+    'SpecResults',
+    'StageProfiler',
+    'TREATMENTS',
+    'ThresholdSweep',
+    'WEIGHT',
+    'WildClusterBootstrap',
+    'absorbed_glm',
+    'absorbed_ols',
+    'absorbed_ols_many',
+    'add_features',
+    'cached_collapse',
+    'cached_ols_many',
+    'cached_panel_cells',
+    'cached_table',
+    'clean_frame',
+    'collapse',
+    'collapse_models',
+    'collapsed_fit',
+    'collapsed_ols',
+    'collect_features',
+    'compact_frame',
+    'fingerprint',
+    'footprint',
+    'iter_arrow_chunks',
+    'iter_dta_chunks',
+    'jackknife_summary',
+    'jackknife_table',
+    'lazy_fit',
+    'load_dta_cached',
+    'memory_report',
+    'panel_cells',
+    'panel_table',
+    'parse_formula',
+    'permutation_table',
+    'point_panels',
+    'stream_fit',
+    'stream_moments',
+    'survey_fit',
+    'survey_ols_many',
+    'synthetic_census',
+    'synthetic_chunks',
+    'threshold_table',
+    'wild_bootstrap_table',
+    'write_synthetic_dta',
+]
+
+
+def __getattr__(name):
+    # didid.batch is also run as ``python -m didid.batch``, so it is only imported on use
+    if name == 'StageProfiler':
+        from .batch import StageProfiler
+        return StageProfiler
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
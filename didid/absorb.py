@@ -0,0 +1,396 @@
+import copy
+import re
+
+import numpy as np
+import pandas as pd
+
+from .covariance import MultiwayClusters, cluster_columns, cluster_dimensions
+from .results import DiDiDResults
+
+_FE_TERM = re.compile(r'^C\((\w+)\)$')
+
+
+def parse_formula(formula):
+    """Split ``"y ~ a + b + C(s)"`` into ``(outcome, regressors, fixed_effects)``.
+
+    ``C(...)`` terms are treated as fixed effects to absorb rather than
+    dummies to expand. The outcome is ``None`` when there is no ``~``.
+    """
+    outcome, _, rhs = formula.rpartition('~')
+    outcome = outcome.strip() or None
+    regressors, fixed_effects = [], []
+    for term in rhs.split('+'):
+        term = term.strip()
+        if not term:
+            continue
+        match = _FE_TERM.match(term)
+        if match:
+            fixed_effects.append(match.group(1))
+        else:
+            regressors.append(term)
+    return outcome, regressors, fixed_effects
+
+
+class FixedEffects:
+    """Integer-coded fixed-effect dimensions and the projections that absorb them.
+
+    Each dimension is stored as one code array, so memory is O(rows) per
+    dimension no matter how many levels it has. With no dimensions the
+    intercept is the only thing absorbed.
+    """
+
+    def __init__(self, codes, names=()):
+        self.codes = [np.asarray(c, dtype=np.intp) for c in codes]
+        self.names = list(names)
+        self.n_levels = [int(c.max()) + 1 if len(c) else 0 for c in self.codes]
+        self.counts = [np.bincount(c, minlength=m).astype(float)
+                       for c, m in zip(self.codes, self.n_levels)]
+
+    @classmethod
+    def from_frame(cls, data, names, mask=None):
+        return cls([factorize(data, name, mask, sort=True)[0] for name in names], names)
+
+    @property
+    def dof(self):
+        """Columns the equivalent dummy expansion (with intercept) would add.
+
+        Counted the way patsy builds ``C(a) + C(b)``: one intercept plus
+        ``levels - 1`` dummies per dimension. This is what statsmodels uses
+        as ``k_params`` in its cluster small-sample correction.
+        """
+        if not self.codes:
+            return 1
+        return sum(self.n_levels) - (len(self.codes) - 1)
+
+    def demean(self, X, weights=None, tol=1e-10, max_iter=10_000):
+        """Project the fixed effects out of ``X`` by alternating projections.
+
+        One sweep is exact for a single dimension; with several, sweeps
+        repeat until the group means removed from every column fall below
+        ``tol`` relative to that column's scale.
+        """
+        X = np.array(X, dtype=float)
+        squeeze = X.ndim == 1
+        if squeeze:
+            X = X[:, None]
+        if not self.codes:
+            if weights is None:
+                X -= X.mean(axis=0)
+            else:
+                X -= (weights @ X) / weights.sum()
+            return X[:, 0] if squeeze else X
+
+        if weights is None:
+            counts = self.counts
+        else:
+            counts = [np.bincount(c, weights=weights, minlength=m)
+                      for c, m in zip(self.codes, self.n_levels)]
+        counts = [np.where(cnt > 0, cnt, 1.0) for cnt in counts]
+
+        scale = np.maximum(np.abs(X).max(axis=0, initial=0.0), 1.0)
+        active = list(range(X.shape[1]))
+        for _ in range(max_iter):
+            still_active = []
+            for j in active:
+                col = X[:, j]
+                delta = 0.0
+                for codes, cnt, m in zip(self.codes, counts, self.n_levels):
+                    wcol = col if weights is None else col * weights
+                    means = np.bincount(codes, weights=wcol, minlength=m) / cnt
+                    col -= means[codes]
+                    delta = max(delta, np.abs(means).max())
+                if len(self.codes) > 1 and delta > tol * scale[j]:
+                    still_active.append(j)
+            active = still_active
+            if not active:
+                break
+        else:
+            raise RuntimeError(
+                f'Fixed-effect projections did not converge in {max_iter} sweeps'
+            )
+        return X[:, 0] if squeeze else X
+
+
+def fe_gram(X, fe, weights=None):
+    """``W'W`` (or ``W'diag(weights)W``) for ``W = [X, all FE indicators]``.
+
+    Built from bincounts, so the indicators are never materialized.
+    """
+    k = X.shape[1]
+    L = fe.n_levels
+    w = np.ones(X.shape[0]) if weights is None else weights
+    off = np.concatenate([[k], k + np.cumsum(L)]).astype(int)
+    WW = np.zeros((off[-1], off[-1]))
+    WW[:k, :k] = (X * w[:, None]).T @ X
+    for d, codes in enumerate(fe.codes):
+        rd = slice(off[d], off[d + 1])
+        xd = np.stack([np.bincount(codes, weights=X[:, j] * w, minlength=L[d])
+                       for j in range(k)]) if k else np.zeros((0, L[d]))
+        WW[:k, rd], WW[rd, :k] = xd, xd.T
+        WW[rd, rd] = np.diag(np.bincount(codes, weights=w, minlength=L[d]))
+        for e in range(d + 1, len(fe.codes)):
+            re_ = slice(off[e], off[e + 1])
+            cross = np.bincount(codes * L[e] + fe.codes[e], weights=w,
+                                minlength=L[d] * L[e]).reshape(L[d], L[e])
+            WW[rd, re_], WW[re_, rd] = cross, cross.T
+    return WW
+
+
+def pinv_psd(A, rtol=1e-10):
+    """Pseudo-inverse of a PSD matrix after equilibrating its diagonal.
+
+    Eigenvalues below ``rtol`` times the largest (after equilibration)
+    are treated as zero, so exactly collinear directions that rounding
+    leaves at ~1e-15 are not inverted.
+    """
+    d = np.sqrt(np.where(np.diag(A) > 0, np.diag(A), 1.0))
+    return np.linalg.pinv(A / np.outer(d, d), rtol=rtol, hermitian=True) / np.outer(d, d)
+
+
+def sample_mask(data, columns):
+    """Rows where every column used by the model is non-missing."""
+    mask = np.ones(len(data), dtype=bool)
+    for col in columns:
+        mask &= data[col].notna().to_numpy()
+    return mask
+
+
+def sample_rows(data, sample=None):
+    """Boolean mask of the rows in ``sample``.
+
+    ``sample`` is a ``DataFrame.query`` string as in ``MODELS`` (rows
+    where it is missing are excluded), a boolean array, or ``None`` for
+    every row. Restricted fits take this mask instead of
+    ``data.query(sample)``, so the frame is never copied.
+    """
+    if sample is None:
+        return np.ones(len(data), dtype=bool)
+    if isinstance(sample, str):
+        return data.eval(sample).fillna(False).to_numpy(dtype=bool)
+    return np.asarray(sample, dtype=bool)
+
+
+def column(data, name, mask=None, dtype=float):
+    values = data[name].to_numpy(dtype=dtype)
+    return values if mask is None else values[mask]
+
+
+def factorize(data, name, mask=None, sort=False):
+    """``pd.factorize`` of ``data[name]`` on the ``mask`` rows: ``(codes, levels)``.
+
+    Categorical columns are factorized through their integer codes, so
+    the category values are never materialised row by row. Missing
+    values get code -1, as in ``pd.factorize``. ``'a:b'`` factorizes the
+    interaction of columns ``a`` and ``b`` (e.g. state x census year).
+    """
+    if ':' in name:
+        parts = [factorize(data, part, mask, sort)[0] for part in name.split(':')]
+        missing = np.any([p < 0 for p in parts], axis=0)
+        combined = np.zeros(len(parts[0]), dtype=np.int64)
+        for p in parts:
+            combined = combined * (int(p.max()) + 1 if len(p) else 1) + p
+        codes = np.full(len(combined), -1, dtype=np.intp)
+        codes[~missing], levels = pd.factorize(combined[~missing], sort=sort)
+        return codes, levels
+    col = data[name]
+    if not isinstance(col.dtype, pd.CategoricalDtype):
+        return pd.factorize(column(data, name, mask, dtype=None), sort=sort)
+    raw = col.cat.codes.to_numpy()
+    raw = raw if mask is None else raw[mask]
+    codes, used = pd.factorize(raw, sort=sort)
+    if (used < 0).any():
+        missing = int(np.flatnonzero(used < 0)[0])
+        codes = np.where(codes == missing, -1, codes - (codes > missing))
+        used = np.delete(used, missing)
+    return codes, col.cat.categories[used]
+
+
+def cluster_codes(data, cluster, mask=None):
+    """``MultiwayClusters`` of ``cluster``: a column (``'a:b'`` for an intersection) or a tuple of them.
+
+    A tuple clusters on each column separately (multi-way), e.g.
+    ``('statefip', 'age')``. Every dimension must be present on the
+    ``mask`` rows.
+    """
+    names = cluster_dimensions(cluster)
+    codes = [factorize(data, name, mask)[0] for name in names]
+    for name, c in zip(names, codes):
+        if (c < 0).any():
+            raise ValueError(f'{name!r} is missing on rows of this sample')
+    return MultiwayClusters(codes, names)
+
+
+class AbsorbedDesign:
+    """Regressors with the fixed effects already projected out.
+
+    Built once per estimation sample; every outcome fit on that sample
+    reuses the demeaned regressors, the fixed-effect codes and the cluster
+    codes. Regressors that vanish after demeaning (for example the
+    state-level ``rlanham_012`` under state fixed effects) are dropped and
+    listed in ``collinear``.
+
+    With ``freq_weights=True`` each row stands for ``weights`` identical
+    observations (e.g. a collapsed cell), so ``nobs`` is the sum of the
+    weights rather than the number of rows. ``cluster`` may be a tuple of
+    columns for multi-way clustering (see ``cluster_codes``).
+    """
+
+    def __init__(self, data, regressors, fixed_effects=(), cluster=None,
+                 mask=None, weights=None, tol=1e-10, freq_weights=False):
+        self.regressors = list(regressors)
+        self.mask = mask
+        self.weights = None if weights is None else column(data, weights, mask)
+        self.n_rows = int(mask.sum()) if mask is not None else len(data)
+        self.nobs = float(self.weights.sum()) if freq_weights else self.n_rows
+        self.fe = FixedEffects.from_frame(data, fixed_effects, mask)
+        self.tol = tol
+
+        X = np.column_stack([column(data, r, mask) for r in self.regressors]) \
+            if self.regressors else np.empty((self.n_rows, 0))
+        Xt = self.fe.demean(X, self.weights, tol)
+        raw_ss = (X ** 2).sum(axis=0)
+        kept = (Xt ** 2).sum(axis=0) > 1e-10 * np.maximum(raw_ss, 1e-300)
+        self.names = [r for r, k in zip(self.regressors, kept) if k]
+        self.collinear = [r for r, k in zip(self.regressors, kept) if not k]
+        self.X = np.ascontiguousarray(Xt[:, kept])
+
+        Xw = self.X if self.weights is None else self.X * self.weights[:, None]
+        self.xtx = Xw.T @ self.X
+        self.bread = np.linalg.pinv(self.xtx)
+
+        self.cluster = cluster
+        if cluster is not None:
+            self.clusters = cluster_codes(data, cluster, mask)
+            self.cluster_codes = self.clusters.cells
+            self.n_clusters = self.clusters.n_clusters
+
+    def with_cluster(self, data, cluster):
+        """This design with its covariance clustered on ``cluster`` instead.
+
+        Shares the demeaned regressors, so switching the clustering level
+        costs one factorization. ``cluster`` must be present on every row
+        of the design's sample.
+        """
+        other = copy.copy(self)
+        other.cluster = cluster
+        if cluster is not None:
+            other.clusters = cluster_codes(data, cluster, self.mask)
+            other.cluster_codes = other.clusters.cells
+            other.n_clusters = other.clusters.n_clusters
+        return other
+
+    def residualize(self, v):
+        """Project the fixed effects and this design's regressors out of ``v``."""
+        vt = self.fe.demean(v, self.weights, self.tol)
+        Xw = self.X if self.weights is None else self.X * self.weights[:, None]
+        return vt - self.X @ (self.bread @ (Xw.T @ vt))
+
+    @property
+    def k_params(self):
+        """Parameter count of the equivalent dummy-expanded statsmodels fit."""
+        return len(self.regressors) + self.fe.dof
+
+    @property
+    def df_resid(self):
+        return self.nobs - len(self.names) - self.fe.dof
+
+    def fit(self, y, name='y', use_correction=True, within_ss=0.0):
+        """Fit one outcome (already restricted to this design's sample).
+
+        ``within_ss`` is variation the rows do not carry, such as the
+        within-cell sum of squares of collapsed data; it is added to both
+        the residual and total sums of squares.
+        """
+        y = np.asarray(y, dtype=float)
+        return self.fit_many(y[:, None], [name], use_correction, [within_ss])[0]
+
+    def fit_many(self, Y, names, use_correction=True, within_ss=None):
+        """Fit several outcomes on this sample in one pass.
+
+        ``Y`` is ``(rows, outcomes)``. The outcomes are demeaned together
+        and solved against the shared ``bread``, so the regressors are
+        neither re-demeaned nor re-factorized per outcome.
+        """
+        Y = np.asarray(Y, dtype=float)
+        Yt = self.fe.demean(Y, self.weights, self.tol)
+        w = self.weights
+        Xw = self.X if w is None else self.X * w[:, None]
+        B = self.bread @ (Xw.T @ Yt)
+        resid = Yt - self.X @ B
+        if w is None:
+            ssr = (resid ** 2).sum(axis=0)
+            tss = ((Y - Y.mean(axis=0)) ** 2).sum(axis=0)
+        else:
+            ssr = w @ resid ** 2
+            tss = w @ (Y - (w @ Y) / w.sum()) ** 2
+        if within_ss is not None:
+            ssr, tss = ssr + within_ss, tss + within_ss
+
+        results = []
+        for m, name in enumerate(names):
+            if self.cluster is not None:
+                cov = self.clusters.cov(self.bread, Xw, resid[:, m], self.nobs,
+                                        self.k_params, use_correction)
+                cov_type, n_groups = 'cluster', self.n_clusters
+            else:
+                cov = self.bread * ssr[m] / self.df_resid
+                cov_type, n_groups = 'nonrobust', None
+            results.append(DiDiDResults(
+                pd.Series(B[:, m], index=self.names), cov, self.nobs, ssr[m], tss[m],
+                self.df_resid, name, n_groups=n_groups, cov_type=cov_type,
+                fixed_effects=self.fe.names, collinear=self.collinear,
+            ))
+        return results
+
+
+def absorbed_ols(formula, data, cluster=None, weights=None, tol=1e-10):
+    """OLS with the ``C(...)`` terms of ``formula`` absorbed instead of expanded.
+
+    Drop-in replacement for
+    ``smf.ols(formula, data).fit(cov_type='cluster', cov_kwds={'groups': data[cluster]})``:
+    the coefficients on the remaining regressors and their state-clustered
+    standard errors match statsmodels, but no dummy columns are ever built,
+    so memory and time scale with rows x regressors rather than rows x levels.
+    Rows with a missing value in any model column are dropped, and the
+    cluster codes are taken from the same rows. ``cluster=('statefip', 'age')``
+    clusters two ways, like statsmodels' two-column ``groups``.
+    """
+    outcome, regressors, fixed_effects = parse_formula(formula)
+    used = [outcome, *regressors, *fixed_effects, *cluster_columns(cluster)]
+    if weights is not None:
+        used.append(weights)
+    mask = sample_mask(data, dict.fromkeys(used))
+    design = AbsorbedDesign(data, regressors, fixed_effects, cluster, mask, weights, tol)
+    return design.fit(column(data, outcome, mask), outcome)
+
+
+def absorbed_ols_many(outcomes, formula, data, cluster=None, weights=None, tol=1e-10,
+                      sample=None):
+    """Fit several outcomes on one right-hand side, sharing the absorbed design.
+
+    ``formula`` is the right-hand side only (the notebook's ``formula``).
+    Outcomes are grouped by their missing-value pattern: each group gets
+    one ``AbsorbedDesign`` (one demeaning and factorization of the
+    regressors) and all its outcomes are solved together. An outcome with
+    its own missing rows (e.g. ``HRSWORK1``) is fit on exactly the rows
+    ``absorbed_ols`` would use. ``sample`` restricts the rows (see
+    ``sample_rows``). Returns results in the order of ``outcomes``.
+    """
+    _, regressors, fixed_effects = parse_formula(formula)
+    used = [*regressors, *fixed_effects, *cluster_columns(cluster)]
+    if weights is not None:
+        used.append(weights)
+    base = sample_mask(data, dict.fromkeys(used)) & sample_rows(data, sample)
+
+    groups = {}
+    for outcome in outcomes:
+        mask = base & data[outcome].notna().to_numpy()
+        key = np.packbits(mask).tobytes()
+        groups.setdefault(key, (mask, []))[1].append(outcome)
+
+    results = {}
+    for mask, members in groups.values():
+        design = AbsorbedDesign(data, regressors, fixed_effects, cluster, mask, weights, tol)
+        Y = np.column_stack([column(data, y, mask) for y in members])
+        results.update(zip(members, design.fit_many(Y, members)))
+    return [results[y] for y in outcomes]
@@ -0,0 +1,242 @@
+"""Headless run of the notebook's core pipeline, with a per-stage resource profile.
+
+``python didid-regression.py --batch`` (or ``python -m didid.batch``)
+runs ingestion -> feature derivation -> the four fits -> comparison
+table -> figures without marimo, writes the table and PNGs to an output
+directory and exits with a status code. Every stage records wall time,
+CPU time and peak resident memory, and the profile is written as JSON
+next to the outputs (also when a stage fails), so scheduled runs can be
+compared across data refreshes.
+
+Peak RSS is per stage on Linux, where the kernel's high-water mark is
+reset before each stage; elsewhere it is the process high-water mark
+when the stage ends.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import sys
+import time
+import traceback
+from pathlib import Path
+
+import numpy as np
+
+from .absorb import absorbed_ols_many
+from .ingest import compact_frame, load_dta_cached
+from .spec import CLUSTER, FORMULA, MODELS
+from .stream import add_features
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SOURCE = 'maternal_employment.dta'
+DEFAULT_OUT = 'batch_output'
+
+# Figure of each model: name -> (title, palette), as drawn in the notebook
+FIGURES = {
+    'paper_emp': ('DiDiD: Employment Probability by Lanham Spending Quartile', 'Set1'),
+    'paper_hours': ('DiDiD: Weekly Hours by Lanham Spending Quartile', 'Set1'),
+    'my_pt': ('DiDiD: Part-Time Probability (Workers Only)', 'Set2'),
+    'my_hours': ('DiDiD: Weekly Hours (Workers Only)', 'Set2'),
+}
+
+_MB = 1 / (1 << 20)
+_STATUS = Path('/proc/self/status')
+_CLEAR_REFS = Path('/proc/self/clear_refs')
+
+
+def _status_kb(field):
+    for line in _STATUS.read_text().splitlines():
+        if line.startswith(field + ':'):
+            return int(line.split()[1])
+    return None
+
+
+def current_rss_mb():
+    """Resident memory of this process now, or ``None`` where it cannot be read."""
+    if _STATUS.exists():
+        return _status_kb('VmRSS') / 1024
+    return None
+
+
+def peak_rss_mb():
+    """High-water mark of resident memory (since the last ``reset_peak_rss``, on Linux)."""
+    if _STATUS.exists():
+        return _status_kb('VmHWM') / 1024
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak * _MB if sys.platform == 'darwin' else peak / 1024
+
+
+def reset_peak_rss():
+    """Reset the kernel's RSS high-water mark; returns False where that is not possible."""
+    try:
+        _CLEAR_REFS.write_text('5')
+    except OSError:
+        return False
+    return True
+
+
+class StageProfiler:
+    """Wall time, CPU time and peak RSS of named pipeline stages.
+
+    ``with profiler.stage('fits'):`` records one stage; the record is
+    kept when the stage raises, with ``ok`` set to False.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.per_stage_peak = False
+
+    @contextlib.contextmanager
+    def stage(self, name, **info):
+        self.per_stage_peak = reset_peak_rss()
+        record = {'name': name, 'ok': False, 'rss_start_mb': current_rss_mb(), **info}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+            record['ok'] = True
+        finally:
+            record['wall_s'] = time.perf_counter() - wall
+            record['cpu_s'] = time.process_time() - cpu
+            record['peak_rss_mb'] = peak_rss_mb()
+            record['rss_end_mb'] = current_rss_mb()
+            self.stages.append(record)
+
+    def summary(self):
+        """Totals over the recorded stages."""
+        peaks = [s['peak_rss_mb'] for s in self.stages if s['peak_rss_mb'] is not None]
+        return {
+            'wall_s': sum(s['wall_s'] for s in self.stages),
+            'cpu_s': sum(s['cpu_s'] for s in self.stages),
+            'peak_rss_mb': max(peaks, default=None),
+        }
+
+    def to_json(self, path, **extra):
+        """Write the profile (stages, totals and ``extra`` fields) to ``path``."""
+        profile = {**extra, 'per_stage_peak': self.per_stage_peak,
+                   'total': self.summary(), 'stages': self.stages}
+        Path(path).write_text(json.dumps(profile, indent=2, default=str))
+        return profile
+
+
+def derive_features(df):
+    """The notebook's feature cells: numeric hours, ``part_time``, ``high_lanham``, interactions."""
+    add_features(df, df['rlanham_012'].median())
+    return compact_frame(df)
+
+
+def fit_models(df, models=MODELS, formula=FORMULA, cluster=CLUSTER):
+    """State-clustered fits of ``models``, one shared design per sample: ``{name: results}``."""
+    samples = {}
+    for name, (outcome, sample) in models.items():
+        samples.setdefault(sample, []).append((name, outcome))
+    fits = {}
+    for sample, members in samples.items():
+        outcomes = list(dict.fromkeys(y for _, y in members))
+        res = dict(zip(outcomes, absorbed_ols_many(outcomes, formula, df, cluster, sample=sample)))
+        fits.update((name, res[y]) for name, y in members)
+    return {name: fits[name] for name in models}
+
+
+def comparison_table(fits):
+    """The notebook's ``summary_col`` comparison table of the four models."""
+    from statsmodels.iolib.summary2 import summary_col
+
+    table = summary_col(list(fits.values()), stars=True, float_format='%0.5f',
+                        model_names=[str(i) for i in range(1, len(fits) + 1)],
+                        regressor_order=['ddd_cont', 'post', 'treated'], drop_omitted=True)
+    table.add_title('Table Comparison: Original Paper Replication & Original Contributions')
+    return table
+
+
+def save_figures(df, out_dir, figures=FIGURES, dpi=120):
+    """Draw the point plots of ``figures`` and save them as PNGs; returns the paths."""
+    import matplotlib.pyplot as plt
+
+    from .plots import panel_cells, panel_table, point_panels
+
+    table = panel_table(panel_cells(df))
+    paths = []
+    for name, (title, palette) in figures.items():
+        g = point_panels(table, name, title, palette=palette)
+        path = Path(out_dir) / f'{name}.png'
+        g.savefig(path, dpi=dpi, bbox_inches='tight')
+        plt.close(g.fig)
+        paths.append(path)
+    return paths
+
+
+def run(source=DEFAULT_SOURCE, out_dir=DEFAULT_OUT, cache_dir=None, figures=True,
+        profile_path=None, backend='pandas'):
+    """Run every stage, writing the outputs and ``profile.json`` to ``out_dir``.
+
+    With ``backend='polars'`` ingestion and features are one lazy query
+    plan (``didid.lazy``), profiled as a single ``ingest`` stage.
+    Returns the exit status: 0 when every stage succeeded, 1 otherwise
+    (the traceback goes to stderr and the error into the profile).
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    profiler = StageProfiler()
+    started = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+    info = {'source': str(source), 'backend': backend, 'started': started, 'pid': os.getpid()}
+    error = None
+    try:
+        if backend == 'polars':
+            from .lazy import collect_features
+            with profiler.stage('ingest') as record:
+                df = compact_frame(collect_features(source, cache_dir=cache_dir))
+                record['rows'] = len(df)
+        else:
+            with profiler.stage('ingest') as record:
+                df = compact_frame(load_dta_cached(source, cache_dir=cache_dir))
+                record['rows'] = len(df)
+            with profiler.stage('features'):
+                df = derive_features(df)
+        with profiler.stage('fits') as record:
+            fits = fit_models(df)
+            record['ddd_cont'] = {name: float(res.params.get('ddd_cont', np.nan))
+                                  for name, res in fits.items()}
+        with profiler.stage('table'):
+            table = comparison_table(fits)
+            (out_dir / 'table.txt').write_text(table.as_text())
+            table.tables[0].to_csv(out_dir / 'table.csv')
+        if figures:
+            with profiler.stage('figures') as record:
+                record['files'] = [p.name for p in save_figures(df, out_dir)]
+    except Exception as exc:
+        traceback.print_exc()
+        error = f'{type(exc).__name__}: {exc}'
+    profiler.to_json(profile_path or out_dir / 'profile.json', **info,
+                     status='ok' if error is None else 'error', error=error)
+    return 0 if error is None else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run the DiDiD pipeline without the notebook UI and profile each stage.')
+    parser.add_argument('--batch', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--source', default=DEFAULT_SOURCE, help='Stata extract to analyse')
+    parser.add_argument('--out', default=DEFAULT_OUT, help='directory for the table, PNGs and profile')
+    parser.add_argument('--cache-dir', default=None, help='Arrow cache directory (default .didid_cache)')
+    parser.add_argument('--profile', default=None, help='profile path (default OUT/profile.json)')
+    parser.add_argument('--no-figures', action='store_true', help='skip the figure stage')
+    parser.add_argument('--backend', choices=['pandas', 'polars'], default='pandas',
+                        help='ingestion/feature engine (polars: one lazy query plan)')
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+    return run(args.source, args.out, args.cache_dir, not args.no_figures, args.profile,
+               args.backend)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
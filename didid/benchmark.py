@@ -0,0 +1,155 @@
+"""Scaling benchmarks on synthetic extracts (``python -m didid.benchmark``).
+
+For each size up to ``dta_rows``, a synthetic extract
+(``didid.synthetic``) goes through the pipeline stage by stage, profiled like the batch run
+(``StageProfiler``):
+
+* ``generate``: draw the raw rows.
+* ``ingest``: ``clean_frame`` and ``compact_frame`` in memory. The
+  extract is also written to a .dta and loaded cold (.dta -> Arrow
+  cache) and warm (memory-mapped cache).
+* ``features`` and ``fits``: the four state-clustered models.
+* ``cluster_se``: one-way, state x year and two-way state and age
+  covariances on the Model 1 design.
+* ``plots``: the four point plots, saved as PNGs.
+
+Sizes above ``dta_rows`` do not fit in memory on ordinary hardware, so
+they measure the out-of-core path instead: one ``stream_fits`` stage
+generates, cleans and derives one chunk at a time and folds it into
+``stream_fit``'s moment accumulators, so peak memory is set by the chunk
+size.
+
+Every size also checks that the planted ``ddd_cont`` effects are
+recovered within ``z_tol`` clustered standard errors. The result is one
+row per size x stage, written as CSV and JSON.
+"""
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from .absorb import AbsorbedDesign, column, parse_formula, sample_mask
+from .batch import StageProfiler, derive_features, fit_models, save_figures
+from .ingest import clean_frame, compact_frame, load_dta_cached
+from .spec import CLUSTER, FORMULA
+from .stream import stream_fit
+from .synthetic import PLANTED, synthetic_census, synthetic_chunks, write_synthetic_dta
+
+SIZES = (10_000, 100_000, 1_000_000)
+CLUSTERINGS = {'state': CLUSTER, 'state_year': 'statefip:post', 'state+age': ('statefip', 'age')}
+
+
+def recovery(fits, planted=PLANTED, z_tol=4.0):
+    """Planted vs estimated ``ddd_cont`` per planted model, with a pass flag."""
+    rows = []
+    for name, effect in planted.items():
+        res = fits[name]
+        coef, se = res.params['ddd_cont'], res.bse['ddd_cont']
+        z = (coef - effect) / se
+        rows.append({'model': name, 'planted': effect, 'coef': coef, 'se': se, 'z': z,
+                     'recovered': bool(abs(z) <= z_tol)})
+    return pd.DataFrame(rows)
+
+
+def _cluster_se(df, formula=FORMULA):
+    """Time the clustered covariances on one shared design of Model 1."""
+    _, regressors, fixed_effects = parse_formula(formula)
+    mask = sample_mask(df, dict.fromkeys(['emp', *regressors, *fixed_effects, 'post']))
+    design = AbsorbedDesign(df, regressors, fixed_effects, None, mask)
+    y = column(df, 'emp', mask)[:, None]
+    return {label: float(design.with_cluster(df, c).fit_many(y, ['emp'])[0].bse['ddd_cont'])
+            for label, c in CLUSTERINGS.items()}
+
+
+def bench_size(n_rows, seed=0, work_dir=None, dta_rows=2_000_000, plots=True, z_tol=4.0):
+    """Profile every stage on an ``n_rows`` extract: ``(stage records, recovery table)``."""
+    work_dir = Path(work_dir or tempfile.mkdtemp(prefix='didid-bench-'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    profiler = StageProfiler()
+    if n_rows > dta_rows:
+        with profiler.stage('stream_fits') as record:
+            fits = stream_fit(clean_frame(chunk) for chunk in synthetic_chunks(n_rows, seed))
+            record['rows'] = int(fits['paper_emp'].nobs)
+        for record in profiler.stages:
+            record['n_rows'] = n_rows
+        return profiler.stages, recovery(fits, z_tol=z_tol).assign(n_rows=n_rows)
+    with profiler.stage('generate'):
+        raw = synthetic_census(n_rows, seed)
+    with profiler.stage('ingest') as record:
+        df = compact_frame(clean_frame(raw))
+        record['rows'] = len(df)
+    del raw
+    path = write_synthetic_dta(work_dir / f'synthetic_{n_rows}.dta', n_rows, seed)
+    cache = work_dir / 'cache'
+    with profiler.stage('ingest_dta_cold'):
+        load_dta_cached(path, cache_dir=cache)
+    with profiler.stage('ingest_dta_warm'):
+        load_dta_cached(path, cache_dir=cache)
+    with profiler.stage('features'):
+        df = derive_features(df)
+    with profiler.stage('fits'):
+        fits = fit_models(df)
+    with profiler.stage('cluster_se') as record:
+        record['ddd_cont_se'] = _cluster_se(df)
+    if plots:
+        import matplotlib.pyplot as plt
+        with profiler.stage('plots'):
+            save_figures(df, work_dir)
+        plt.close('all')
+    for record in profiler.stages:
+        record['n_rows'] = n_rows
+    return profiler.stages, recovery(fits, z_tol=z_tol).assign(n_rows=n_rows)
+
+
+def run(sizes=SIZES, seed=0, out_dir='bench_output', **kwargs):
+    """Benchmark every size; writes ``stages.csv``, ``recovery.csv`` and ``benchmark.json``."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stages, checks = [], []
+    for n in sizes:
+        records, check = bench_size(int(n), seed, out_dir / f'n{int(n)}', **kwargs)
+        stages += records
+        checks.append(check)
+    table = pd.DataFrame(stages)
+    table = table[['n_rows', 'name', 'wall_s', 'cpu_s', 'peak_rss_mb',
+                   *[c for c in table.columns if c not in
+                     ('n_rows', 'name', 'wall_s', 'cpu_s', 'peak_rss_mb')]]]
+    checks = pd.concat(checks, ignore_index=True)
+    table.to_csv(out_dir / 'stages.csv', index=False)
+    checks.to_csv(out_dir / 'recovery.csv', index=False)
+    (out_dir / 'benchmark.json').write_text(json.dumps(
+        {'seed': seed, 'stages': stages, 'recovery': checks.to_dict('records')},
+        indent=2, default=str))
+    return table, checks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scaling benchmarks on synthetic extracts.')
+    parser.add_argument('--sizes', type=float, nargs='+', default=SIZES,
+                        help='rows per extract, 1e4 to 1e8 (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='bench_output')
+    parser.add_argument('--dta-rows', type=float, default=2e6,
+                        help='largest size held in memory (and benchmarked through a .dta '
+                             'file); larger sizes are streamed')
+    parser.add_argument('--no-plots', action='store_true')
+    parser.add_argument('--z-tol', type=float, default=4.0,
+                        help='allowed |estimate - planted| in clustered SEs')
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+    table, checks = run([int(n) for n in args.sizes], args.seed, args.out,
+                        dta_rows=int(args.dta_rows), plots=not args.no_plots, z_tol=args.z_tol)
+    with pd.option_context('display.width', 120, 'display.max_columns', 10):
+        print(table[['n_rows', 'name', 'wall_s', 'cpu_s', 'peak_rss_mb']].round(3).to_string(index=False))
+        print()
+        print(checks.round(5).to_string(index=False))
+    return 0 if checks['recovered'].all() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Persistent, content-addressed cache for fitted models and collapsed statistics.
+
+Marimo reruns every downstream cell when an upstream cell changes, even
+if the change cannot affect a fit. Results here are stored on disk
+under a key built from a fingerprint of the data columns the fit
+actually reads, plus the formula, sample restriction and covariance
+options. An unrelated edit, or reopening the notebook, is then a cache
+hit. Any change to the inputs changes the key, so a stale result is
+never served. The directory is kept under ``max_bytes`` by evicting the
+least recently used entries.
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .absorb import absorbed_ols_many, parse_formula, sample_rows
+from .collapse import CELL_KEYS, collapse_models
+from .covariance import cluster_columns
+from .plots import PANEL_KEYS, panel_cells
+from .spec import CLUSTER, FORMULA, LANHAM_TERMS, MODELS
+
+# Bump when an estimator changes in a way that alters stored results
+RESULTS_VERSION = 1
+
+DEFAULT_DIR = Path('.didid_cache') / 'results'
+
+
+def fingerprint(data, columns=None):
+    """Content hash of ``data[columns]`` (values, dtypes and column names)."""
+    columns = list(data.columns if columns is None else dict.fromkeys(columns))
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([[c, str(data[c].dtype)] for c in columns]).encode())
+    h.update(str(len(data)).encode())
+    for c in columns:
+        h.update(pd.util.hash_pandas_object(data[c], index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU store of pickled results, one file per key."""
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=1 << 30):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def key(self, **parts):
+        """Stable key for the given JSON-serialisable parts (plus ``RESULTS_VERSION``)."""
+        payload = json.dumps({'version': RESULTS_VERSION, **parts}, sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+    def _path(self, key):
+        return self.directory / f'{key}.pkl'
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fh:
+                value = pickle.load(fh)
+        except FileNotFoundError:
+            return default
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # Truncated, or pickled against a class that has since been renamed or moved
+            path.unlink(missing_ok=True)
+            return default
+        os.utime(path)  # mark as recently used
+        return value
+
+    def put(self, key, value):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(f'.tmp{os.getpid()}')
+        with open(tmp, 'wb') as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        if tmp.stat().st_size > self.max_bytes:
+            tmp.unlink()  # would evict everything else and still not fit
+            return value
+        os.replace(tmp, path)
+        self.evict()
+        return value
+
+    def get_or_compute(self, key, compute):
+        """Return the stored value for ``key``, computing and storing it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.put(key, compute())
+        return value
+
+    def entries(self):
+        """``(path, size, last_used)`` for every stored result, oldest first."""
+        if not self.directory.exists():
+            return []
+        found = [(p, p.stat()) for p in self.directory.glob('*.pkl')]
+        return sorted(((p, st.st_size, st.st_mtime) for p, st in found), key=lambda e: e[2])
+
+    @property
+    def size_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in ``max_bytes``."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            path.unlink(missing_ok=True)
+
+
+def cached_ols_many(cache, outcomes, formula, data, cluster=None, sample=None, **kwargs):
+    """``absorbed_ols_many`` through ``cache``.
+
+    ``sample`` restricts the rows as in ``absorbed_ols_many``; the key
+    covers the rows it selects, so a query string and the equivalent
+    boolean mask share an entry.
+    """
+    _, regressors, fixed_effects = parse_formula(formula)
+    used = [*outcomes, *regressors, *fixed_effects, *cluster_columns(cluster)]
+    used += [kwargs['weights']] if kwargs.get('weights') else []
+    rows = sample_rows(data, sample)
+    key = cache.key(kind='absorbed_ols_many', data=fingerprint(data, used),
+                    rows=hashlib.blake2b(np.packbits(rows).tobytes(), digest_size=16).hexdigest(),
+                    outcomes=list(outcomes), formula=formula, cluster=cluster, options=kwargs)
+    return cache.get_or_compute(
+        key, lambda: absorbed_ols_many(outcomes, formula, data, cluster, sample=rows, **kwargs))
+
+
+def _model_columns(data, models, by=()):
+    """Columns of ``data`` read by ``models``: ``by``, spending, the outcomes and sample restrictions."""
+    used = set(by) | {'rlanham_012'}
+    for outcome, sample in models.values():
+        used.add(outcome)
+        if sample is not None:
+            used.update(c for c in re.findall(r'[A-Za-z_]\w*', sample) if c in data.columns)
+    return sorted(used)
+
+
+def cached_collapse(cache, data, models=MODELS, by=CELL_KEYS):
+    """``collapse_models`` through ``cache``."""
+    used = _model_columns(data, models, by)
+    key = cache.key(kind='collapse_models', data=fingerprint(data, used),
+                    models={k: list(v) for k, v in models.items()}, by=list(by))
+    return cache.get_or_compute(key, lambda: collapse_models(data, models, by))
+
+
+def cached_panel_cells(cache, data, models=MODELS, by=PANEL_KEYS):
+    """``panel_cells`` through ``cache``."""
+    used = _model_columns(data, models, by)
+    key = cache.key(kind='panel_cells', data=fingerprint(data, used),
+                    models={k: list(v) for k, v in models.items()}, by=list(by))
+    return cache.get_or_compute(key, lambda: panel_cells(data, models, by))
+
+
+def cached_table(cache, table, data, models=MODELS, formula=FORMULA, **options):
+    """``table(data, models=models, formula=formula, **options)`` through ``cache``.
+
+    For the per-model inference tables (``wild_bootstrap_table``,
+    ``permutation_table``): the key covers every column the models read
+    (including the components of the spending interactions) and
+    ``options`` such as ``reps`` and ``seed``.
+    """
+    _, regressors, fixed_effects = parse_formula(formula)
+    used = [*_model_columns(data, models), *regressors, *fixed_effects, *cluster_columns(CLUSTER),
+            *(c for r in regressors for c in LANHAM_TERMS.get(r, ()))]
+    key = cache.key(kind=table.__name__, data=fingerprint(data, used),
+                    models={k: list(v) for k, v in models.items()}, formula=formula,
+                    options=options)
+    return cache.get_or_compute(
+        key, lambda: table(data, models=models, formula=formula, **options))
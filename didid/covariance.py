@@ -0,0 +1,139 @@
+"""Cluster-robust covariance from group sums of the scores.
+
+One-way clustering needs only the per-cluster sums of the scores, which
+``np.bincount`` gives one column at a time. Multi-way clustering
+(Cameron, Gelbach and Miller 2011) combines one-way sandwiches on every
+intersection of the dimensions; ``MultiwayClusters`` sums the scores
+once per cell of the finest intersection and regroups those cell sums
+for each term, so nothing larger than cells x k is ever held.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+
+def group_sums(scores, codes, n_groups=None, weights=None):
+    """Sum the rows of ``scores`` (times ``weights``) within each group using ``np.bincount``.
+
+    Passing the row multiplier as ``weights`` (e.g. the residuals) forms
+    the scores one column at a time instead of as a rows x k array.
+    """
+    scores = np.asarray(scores, dtype=float)
+    if scores.ndim == 1:
+        scores = scores[:, None]
+    n_groups = int(codes.max()) + 1 if n_groups is None else n_groups
+    sums = np.zeros((n_groups, scores.shape[1]))
+    for j in range(scores.shape[1]):
+        col = scores[:, j] if weights is None else scores[:, j] * weights
+        sums[:, j] = np.bincount(codes, weights=col, minlength=n_groups)
+    return sums
+
+
+def cluster_meat(scores, codes, n_groups=None):
+    """Cluster meat matrix sum_g s_g s_g' from the observation-level scores."""
+    sums = group_sums(scores, codes, n_groups)
+    return sums.T @ sums
+
+
+def cluster_correction(n_groups, nobs, k_params):
+    """Small-sample factor used by statsmodels' ``cov_cluster``."""
+    return n_groups / (n_groups - 1.) * (nobs - 1.) / (nobs - k_params)
+
+
+def cluster_cov(bread, scores, codes, n_groups, nobs, k_params, use_correction=True):
+    """One-way cluster-robust sandwich ``bread @ meat @ bread``."""
+    cov = bread @ cluster_meat(scores, codes, n_groups) @ bread
+    if use_correction:
+        cov *= cluster_correction(n_groups, nobs, k_params)
+    return cov
+
+
+def clip_eigenvalues(cov):
+    """Nearest PSD matrix: negative eigenvalues set to zero (Cameron, Gelbach and Miller)."""
+    vals, vecs = np.linalg.eigh(cov)
+    if vals.min(initial=0.0) >= 0:
+        return cov
+    return (vecs * np.maximum(vals, 0)) @ vecs.T
+
+
+def cluster_dimensions(cluster):
+    """Columns of a clustering: ``None``, one column, or a tuple of columns for multi-way."""
+    if cluster is None:
+        return []
+    return [cluster] if isinstance(cluster, str) else list(cluster)
+
+
+def cluster_columns(cluster):
+    """Data columns a clustering reads: its dimensions, with ``'a:b'`` split into ``a`` and ``b``."""
+    return list(dict.fromkeys(part for name in cluster_dimensions(cluster)
+                              for part in name.split(':')))
+
+
+class MultiwayClusters:
+    """Cluster codes of one or more dimensions, reduced to the cells of their intersection.
+
+    The covariance is ``sum_S (-1)^(|S| + 1) V_S`` over the non-empty
+    subsets ``S`` of the dimensions, where ``V_S`` is the one-way
+    sandwich clustered on the intersection of ``S`` with its own
+    small-sample factor (two dimensions give statsmodels'
+    ``cov_cluster_2groups``). Every such intersection is a union of
+    cells, so the scores are summed per cell once and each term regroups
+    the cell sums. With one dimension this is the usual one-way
+    covariance.
+    """
+
+    def __init__(self, codes, names=()):
+        codes = [np.asarray(c, dtype=np.intp) for c in codes]
+        self.names = list(names)
+        self.n_groups = [int(c.max()) + 1 for c in codes]
+        if len(codes) == 1:
+            self.cells, self.n_cells = codes[0], self.n_groups[0]
+            self.terms = [(1, np.arange(self.n_cells), self.n_cells)]
+            return
+
+        combined = np.zeros(len(codes[0]), dtype=np.int64)
+        for c, g in zip(codes, self.n_groups):
+            combined = combined * g + c
+        self.cells, cell_values = pd.factorize(combined)
+        self.n_cells = len(cell_values)
+        levels = []
+        for g in reversed(self.n_groups):
+            levels.append(cell_values % g)
+            cell_values = cell_values // g
+        levels = levels[::-1]
+
+        # (sign, group of every cell, number of groups) per intersection
+        self.terms = []
+        for size in range(1, len(codes) + 1):
+            for subset in itertools.combinations(range(len(codes)), size):
+                key = np.zeros(self.n_cells, dtype=np.int64)
+                for d in subset:
+                    key = key * self.n_groups[d] + levels[d]
+                group, uniques = pd.factorize(key)
+                self.terms.append(((-1) ** (size + 1), group, len(uniques)))
+
+    @property
+    def n_clusters(self):
+        """Clusters of the coarsest dimension, the count that limits inference."""
+        return min(self.n_groups)
+
+    def meat(self, scores, weights=None, nobs=None, k_params=None, use_correction=True):
+        """Signed sum of the per-term meat matrices, each with its small-sample factor."""
+        sums = group_sums(scores, self.cells, self.n_cells, weights)
+        meat = np.zeros((sums.shape[1], sums.shape[1]))
+        for sign, group, G in self.terms:
+            s = group_sums(sums, group, G) if len(self.terms) > 1 else sums
+            term = s.T @ s
+            if use_correction:
+                term *= cluster_correction(G, nobs, k_params)
+            meat += sign * term
+        return meat
+
+    def cov(self, bread, scores, weights=None, nobs=None, k_params=None, use_correction=True,
+            psd=True):
+        """Cluster-robust sandwich; with several dimensions and ``psd``, eigenvalue-clipped."""
+        cov = bread @ self.meat(scores, weights, nobs, k_params, use_correction) @ bread
+        if psd and len(self.terms) > 1:
+            cov = clip_eigenvalues(cov)
+        return cov
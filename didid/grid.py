@@ -0,0 +1,277 @@
+"""Specification grid: every combination of outcome, sample, FE set, treatment and clustering.
+
+A grid is declared as one mapping per dimension (see ``spec.py`` for the
+defaults) and expanded into its cross product. Work is shared wherever
+the specifications allow it: the regressors of each sample x treatment
+pair are built once, each sample x treatment x FE set is demeaned once
+for all of its outcomes (grouped by missing-value pattern, as in
+``absorbed_ols_many``), and every clustering level reuses that design.
+The sample x treatment pairs are independent and can run on a process
+pool; each worker receives its pair's design frame once and fits all of
+its FE sets.
+
+Results go to a ``SpecResults`` table with one row per specification
+and term. It is stored as an Arrow file and answers the queries behind
+``summary_col``-style tables and specification-curve plots.
+"""
+import concurrent.futures
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from .absorb import AbsorbedDesign, column, sample_mask, sample_rows
+from .ingest import read_arrow, write_arrow
+from .spec import CLUSTERS, FE_SETS, SAMPLES, TREATMENTS
+
+# Regressors of the DiDiD specification, named as in FORMULA whatever the treatment
+REGRESSORS = ['rlanham_012', 'post', 'treat_post_cont', 'treat_lanham_cont',
+              'post_lanham_cont', 'ddd_cont']
+
+SPEC_KEYS = ['outcome', 'sample', 'fixed_effects', 'treatment', 'cluster']
+
+# Cluster label of specifications with i.i.d. errors
+NO_CLUSTER = 'none'
+
+
+def treatment_values(data, treatment):
+    """Spending measure of ``treatment`` (a column, or ``(column, level)`` for a 0/1 indicator)."""
+    if isinstance(treatment, str):
+        return data[treatment].to_numpy(dtype=float)
+    name, level = treatment
+    values = data[name]
+    return np.where(values.isna(), np.nan, (values == level).to_numpy(dtype=float))
+
+
+def _cluster(label):
+    """Clustering of a grid label: ``None``, a column, or a tuple for ``'a+b'`` (multi-way)."""
+    if label == NO_CLUSTER:
+        return None
+    return tuple(label.split('+')) if '+' in label else label
+
+
+def _components(names):
+    return [part for name in names if _cluster(name) is not None
+            for dim in name.split('+') for part in dim.split(':')]
+
+
+def _design_frame(data, sample, treatment, outcomes, keys):
+    """Regressors, outcomes and FE/cluster columns for one sample x treatment, on its rows only."""
+    lanham = treatment_values(data, treatment)
+    rows = sample_rows(data, sample) & ~np.isnan(lanham)
+    rows &= sample_mask(data, dict.fromkeys(['treated', 'post', *keys]))
+    lanham = lanham[rows]
+    treated, post = column(data, 'treated', rows), column(data, 'post', rows)
+    frame = pd.DataFrame({
+        'rlanham_012': lanham,
+        'post': post,
+        'treat_post_cont': treated * post,
+        'treat_lanham_cont': treated * lanham,
+        'post_lanham_cont': post * lanham,
+        'ddd_cont': treated * post * lanham,
+    })
+    for name in dict.fromkeys(keys):
+        frame[name] = data[name][rows].reset_index(drop=True)
+    for y in outcomes:
+        frame[f'y:{y}'] = pd.to_numeric(data[y][rows], errors='coerce').to_numpy(dtype=float)
+    return frame
+
+
+def _fit_group(frame, outcomes, fixed_effects, clusters, tol=1e-10):
+    """Fit every outcome x cluster of one sample x treatment x FE set: ``{(outcome, cluster): results}``."""
+    groups = {}
+    for y in outcomes:
+        mask = frame[f'y:{y}'].notna().to_numpy()
+        groups.setdefault(np.packbits(mask).tobytes(), (mask, []))[1].append(y)
+
+    fits = {}
+    for mask, members in groups.values():
+        design = AbsorbedDesign(frame, REGRESSORS, fixed_effects, _cluster(clusters[0]), mask,
+                                tol=tol)
+        Y = np.column_stack([column(frame, f'y:{y}', mask) for y in members])
+        for label in clusters:
+            cluster = _cluster(label)
+            d = design if cluster == design.cluster else design.with_cluster(frame, cluster)
+            fits.update(((y, label), res) for y, res in zip(members, d.fit_many(Y, members)))
+    return fits
+
+
+def _fit_pair(frame, groups, tol=1e-10):
+    """``_fit_group`` for every FE set of one sample x treatment, so ``frame`` is sent to a worker once."""
+    return [_fit_group(frame, outcomes, fixed_effects, clusters, tol)
+            for outcomes, fixed_effects, clusters in groups]
+
+
+class SpecGrid:
+    """Cross product of outcomes, samples, FE sets, treatments and clustering levels.
+
+    Each argument but ``outcomes`` maps a label to its definition:
+    ``samples`` to a restriction (``None`` or a query string),
+    ``fixed_effects`` to a tuple of FE columns (``'a:b'`` interacts two
+    columns), ``treatments`` to a spending column or ``(column, level)``.
+    ``clusters`` lists clusterings as the estimators take them (a
+    column, ``None`` for i.i.d. errors, or a tuple for multi-way
+    clustering, which the results label ``'a+b'``).
+    ``exclude`` is a function of the five labels returning True for
+    combinations to skip.
+    """
+
+    def __init__(self, outcomes, samples=SAMPLES, fixed_effects=FE_SETS, treatments=TREATMENTS,
+                 clusters=CLUSTERS, exclude=None):
+        self.outcomes = list(outcomes)
+        self.samples = dict(samples)
+        self.fixed_effects = {k: tuple(v) for k, v in fixed_effects.items()}
+        self.treatments = dict(treatments)
+        self.clusters = [NO_CLUSTER if c is None else c if isinstance(c, str) else '+'.join(c)
+                         for c in clusters]
+        self.exclude = exclude
+
+    def specs(self):
+        """One row per specification, with the labels of its five choices."""
+        combos = itertools.product(self.outcomes, self.samples, self.fixed_effects,
+                                   self.treatments, self.clusters)
+        rows = [c for c in combos if self.exclude is None or not self.exclude(*c)]
+        return pd.DataFrame(rows, columns=SPEC_KEYS)
+
+    def __len__(self):
+        return len(self.specs())
+
+    def run(self, data, n_jobs=None, tol=1e-10):
+        """Fit every specification on ``data``; ``n_jobs`` > 1 uses a process pool."""
+        specs = self.specs()
+        keys = _components([c for fe in self.fixed_effects.values() for c in fe] + self.clusters)
+        tasks, labels = [], []
+        for (sample, treatment), by_pair in specs.groupby(['sample', 'treatment'], sort=False):
+            frame = _design_frame(data, self.samples[sample], self.treatments[treatment],
+                                  by_pair['outcome'].unique(), keys)
+            groups = []
+            for fe, group in by_pair.groupby('fixed_effects', sort=False):
+                clusters = list(dict.fromkeys(group['cluster']))
+                groups.append((list(group['outcome'].unique()), self.fixed_effects[fe], clusters))
+                labels.append((sample, fe, treatment, group))
+            tasks.append((frame, groups, tol))
+
+        if n_jobs is not None and n_jobs > 1 and len(tasks) > 1:
+            with concurrent.futures.ProcessPoolExecutor(n_jobs) as pool:
+                results = list(pool.map(_fit_pair, *zip(*tasks)))
+        else:
+            results = [_fit_pair(*task) for task in tasks]
+        results = [fits for pair in results for fits in pair]
+
+        records = []
+        for (sample, fe, treatment, group), fits in zip(labels, results):
+            for outcome, cluster in group[['outcome', 'cluster']].itertuples(index=False):
+                res = fits[outcome, cluster]
+                for term in res.params.index:
+                    records.append({
+                        'outcome': outcome, 'sample': sample, 'fixed_effects': fe,
+                        'treatment': treatment,
+                        'cluster': cluster,
+                        'term': term, 'coef': res.params[term], 'se': res.bse[term],
+                        'pvalue': res.pvalues[term], 'nobs': int(res.nobs),
+                        'n_clusters': res.n_groups or 0,
+                    })
+        return SpecResults(pd.DataFrame(records))
+
+
+class SpecResults:
+    """Long results table of a ``SpecGrid`` run: one row per specification x term."""
+
+    def __init__(self, frame):
+        self.frame = frame.reset_index(drop=True)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def save(self, path):
+        """Write the table as an Arrow IPC file."""
+        write_arrow(self.frame, path)
+        return path
+
+    @classmethod
+    def load(cls, path, columns=None):
+        """Read a table written by ``save``, decoding only ``columns``."""
+        return cls(read_arrow(path, columns))
+
+    def query(self, term='ddd_cont', **choices):
+        """Rows for ``term`` (all terms if ``None``) matching ``choices``, e.g. ``sample='all'``.
+
+        A choice may be a single label or a list of labels.
+        """
+        mask = np.ones(len(self.frame), dtype=bool)
+        if term is not None:
+            mask &= (self.frame['term'] == term).to_numpy()
+        for key, value in choices.items():
+            values = [value] if isinstance(value, str) or value is None else list(value)
+            mask &= self.frame[key].isin(values).to_numpy()
+        return self.frame[mask]
+
+    def table(self, terms=('ddd_cont',), columns=('outcome', 'sample'), stars=(0.1, 0.05, 0.01),
+              float_format='{:.4f}', **choices):
+        """``summary_col``-style table: coefficient and (SE) per term, N last.
+
+        One column per distinct combination of ``columns`` among the
+        specifications matching ``choices``; every other dimension must
+        then be fixed by ``choices`` so each cell holds a single
+        estimate.
+        """
+        rows = self.query(None, **choices)
+        rows = rows[rows['term'].isin(terms)]
+        columns = list(columns)
+        if rows.duplicated(columns + ['term']).any():
+            free = [k for k in SPEC_KEYS if k not in columns and k not in choices]
+            raise ValueError(f'Several specifications per column; fix {free} with keyword filters')
+
+        def cell(r):
+            mark = '*' * sum(r.pvalue < s for s in stars)
+            return float_format.format(r.coef) + mark, '(' + float_format.format(r.se) + ')'
+
+        out = {}
+        for key, group in rows.groupby(columns, sort=False):
+            label = ' | '.join(map(str, key if isinstance(key, tuple) else (key,)))
+            col = {}
+            for r in group.itertuples():
+                col[(r.term, 'coef')], col[(r.term, 'se')] = cell(r)
+            col[('N', '')] = str(int(group['nobs'].iloc[0]))
+            out[label] = col
+        table = pd.DataFrame(out)
+        order = [(t, part) for t in terms for part in ('coef', 'se')] + [('N', '')]
+        table = table.reindex([o for o in order if o in table.index]).fillna('')
+        table.index = [t if part != 'se' else '' for t, part in table.index]
+        return table
+
+    def curve(self, term='ddd_cont', alpha=0.05, ax=None, **choices):
+        """Specification-curve plot of ``term``: sorted estimates with CIs over the choices made.
+
+        The top panel shows each specification's estimate and normal
+        confidence interval, sorted by size; the bottom panel marks the
+        label chosen in every dimension that varies.
+        """
+        import matplotlib.pyplot as plt
+        from statistics import NormalDist
+
+        rows = self.query(term, **choices).sort_values('coef').reset_index(drop=True)
+        dims = [k for k in SPEC_KEYS if rows[k].nunique() > 1]
+        ticks = [(k, v) for k in dims for v in rows[k].unique()]
+        z = NormalDist().inv_cdf(1 - alpha / 2)
+        x = np.arange(len(rows))
+
+        if ax is None:
+            fig, (ax, ax_dims) = plt.subplots(
+                2, 1, sharex=True, figsize=(max(6, 0.12 * len(rows) + 3), 3 + 0.25 * len(ticks)),
+                gridspec_kw={'height_ratios': [2, max(1, 0.25 * len(ticks))]})
+        else:
+            fig, ax_dims = ax.figure, None
+        significant = (rows['pvalue'] < alpha).to_numpy()
+        ax.errorbar(x, rows['coef'], yerr=z * rows['se'], fmt='none', ecolor='0.7', zorder=1)
+        ax.scatter(x, rows['coef'], c=np.where(significant, 'C3', 'C0'), s=12, zorder=2)
+        ax.axhline(0, color='k', lw=0.8)
+        ax.set_ylabel(f'{term} ({1 - alpha:.0%} CI)')
+        if ax_dims is not None:
+            for i, (k, v) in enumerate(ticks):
+                ax_dims.scatter(x[rows[k] == v], np.full((rows[k] == v).sum(), i), marker='|', c='k')
+            ax_dims.set_yticks(range(len(ticks)), [f'{k}: {v}' for k, v in ticks])
+            ax_dims.invert_yaxis()
+            ax_dims.set_xlabel('Specification (sorted by estimate)')
+        fig.tight_layout()
+        return fig
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+# Columns the four DiDiD models (and the plots) actually read
+MODEL_COLUMNS = ['emp', 'HRSWORK1', 'treated', 'post', 'rlanham_012', 'statefip', 'age', 'race']
+
+# Bump whenever clean_frame or the cache layout changes so old caches are not reused
+CACHE_VERSION = 2
+
+# Rows per record batch in the Arrow cache, so it can also be streamed
+BATCH_ROWS = 1 << 20
+
+# Narrowest safe in-memory dtype per column (see compact_frame)
+SCHEMA = {
+    'statefip': 'category',
+    'age': 'category',
+    'race': 'int8',
+    'treated': 'int8',
+    'post': 'int8',
+    'emp': 'int8',
+    'part_time': 'int8',
+    'HRSWORK1': 'float32',
+    'rlanham_012': 'float32',
+    'high_lanham': 'category',
+}
+
+
+def clean_frame(df):
+    """Apply the notebook's sample restriction and missing-value cleaning.
+
+    Drops Black mothers (``race == 2``) and turns the ``'N/A'`` codes into
+    real NaNs. Only text/categorical columns can hold ``'N/A'``, so numeric
+    columns are left alone instead of scanning the whole frame.
+    """
+    df = df[df['race'] != 2]
+    text_cols = [c for c in df.columns
+                 if not pd.api.types.is_numeric_dtype(df[c])]
+    if text_cols:
+        df = df.assign(**{c: df[c].replace('N/A', np.nan) for c in text_cols})
+    return df.reset_index(drop=True)
+
+
+def _narrow(values, dtype):
+    """``values`` as ``dtype`` if no value changes; otherwise the closest lossless type."""
+    if dtype == 'category':
+        return values.astype('category')
+    x = values
+    if not pd.api.types.is_numeric_dtype(x):
+        x = pd.to_numeric(values, errors='coerce')  # e.g. HRSWORK1 after the 'N/A' cleaning
+        if x.isna().sum() != values.isna().sum():
+            return values  # genuine text
+    present = x.dropna()
+    if dtype == 'int8':
+        info = np.iinfo(np.int8)
+        if not ((present % 1 == 0) & present.between(info.min, info.max)).all():
+            return x
+        if not x.isna().any():
+            return x.astype(np.int8)
+        dtype = 'float32'  # small integers with missing values
+    narrow = x.astype(dtype)
+    return narrow if np.array_equal(narrow.to_numpy(dtype=float), x.to_numpy(dtype=float),
+                                    equal_nan=True) else x
+
+
+def compact_frame(df, schema=SCHEMA):
+    """Return ``df`` with every ``schema`` column stored in its compact dtype.
+
+    Codes and flags become categoricals or ``int8``. A cast is only made
+    when every value survives it: a flag with missing values becomes
+    ``float32`` instead of ``int8``, and a float column stays ``float64``
+    unless ``float32`` represents it exactly. Columns not in ``schema``
+    are left alone. The estimators accept the compact frame as is.
+    """
+    return df.assign(**{c: _narrow(df[c], dtype) for c, dtype in schema.items()
+                        if c in df.columns})
+
+
+def footprint(df):
+    """Per-column dtype and memory (MB) of ``df``, enough for ``memory_report``."""
+    return pd.DataFrame({'dtype': df.dtypes.astype(str),
+                         'mb': df.memory_usage(index=False, deep=True) / (1 << 20)})
+
+
+def _is_footprint(x):
+    return list(x.columns) == ['dtype', 'mb']
+
+
+def memory_report(before, after):
+    """Per-column dtype and memory (MB) of two versions of a frame, plus a total row.
+
+    Either version may be given as its ``footprint``, so the original
+    frame can be released before the report is made.
+    """
+    before, after = (x if _is_footprint(x) else footprint(x) for x in (before, after))
+    report = pd.DataFrame({
+        'dtype_before': before['dtype'],
+        'dtype_after': after['dtype'],
+        'mb_before': before['mb'],
+        'mb_after': after['mb'],
+    })
+    report.loc['total'] = ['', '', report['mb_before'].sum(), report['mb_after'].sum()]
+    report['ratio'] = report['mb_after'] / report['mb_before']
+    return report
+
+
+def file_digest(path, block_size=1 << 20, cache_dir=None):
+    """Content hash of ``path``, memoised on (size, mtime) in a sidecar file.
+
+    Hashing a multi-GB extract takes a while, so the digest is only
+    recomputed when the file's size or modification time changes. The
+    sidecar goes to ``cache_dir`` (default ``.didid_cache`` next to
+    ``path``), so the data directory can be read-only.
+    """
+    path = Path(path)
+    stat = path.stat()
+    memo = _cache_dir(path, cache_dir) / f'{path.name}.digest.json'
+    stamp = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if memo.exists():
+        saved = json.loads(memo.read_text())
+        if saved.get('stamp') == stamp:
+            return saved['digest']
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as fh:
+        while block := fh.read(block_size):
+            h.update(block)
+    digest = h.hexdigest()
+    memo.parent.mkdir(parents=True, exist_ok=True)
+    memo.write_text(json.dumps({'stamp': stamp, 'digest': digest}))
+    return digest
+
+
+def _cache_dir(path, cache_dir=None):
+    return Path(cache_dir) if cache_dir is not None else Path(path).parent / '.didid_cache'
+
+
+def cache_path(path, cache_dir=None):
+    """Location of the Arrow IPC cache for the current contents of ``path``."""
+    path = Path(path)
+    name = f'{path.stem}-{file_digest(path, cache_dir=cache_dir)}-v{CACHE_VERSION}.arrow'
+    return _cache_dir(path, cache_dir) / name
+
+
+def _dictionary_array(values, dtype):
+    """Categorical ``values`` as an Arrow dictionary array with valid keys under its nulls.
+
+    ``pa.Table.from_pandas`` keeps pandas' ``-1`` code in the null slots,
+    which Arrow readers that check every key (Polars) reject.
+    """
+    codes = values.cat.codes.to_numpy()
+    missing = codes < 0
+    indices = pa.array(np.where(missing, 0, codes), type=dtype.index_type, mask=missing)
+    dictionary = pa.array(values.cat.categories, type=dtype.value_type)
+    return pa.DictionaryArray.from_arrays(indices, dictionary, ordered=dtype.ordered)
+
+
+def write_arrow(df, target):
+    """Write ``df`` as an uncompressed Arrow IPC file (atomically)."""
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, name in enumerate(df.columns):
+        if isinstance(df[name].dtype, pd.CategoricalDtype):
+            table = table.set_column(i, table.field(i),
+                                     _dictionary_array(df[name], table.field(i).type))
+    tmp = target.with_suffix(f'.tmp{os.getpid()}')
+    with pa.OSFile(str(tmp), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=BATCH_ROWS)
+    os.replace(tmp, target)
+
+
+def read_arrow(source, columns=None, optional=()):
+    """Memory-map an Arrow IPC file and materialise only ``columns``.
+
+    ``optional`` columns are added when the file has them.
+    """
+    with pa.memory_map(str(source), 'r') as mm:
+        table = pa.ipc.open_file(mm).read_all()
+        if columns is not None:
+            extra = [c for c in optional if c in table.column_names]
+            table = table.select(list(dict.fromkeys([*columns, *extra])))
+        return table.to_pandas()
+
+
+def load_dta_cached(path, columns=MODEL_COLUMNS, cache_dir=None, optional=()):
+    """Load the cleaned extract, converting the .dta to Arrow on first use.
+
+    The first call reads the Stata file, applies ``clean_frame`` and writes
+    the typed result to ``.didid_cache/`` keyed by the file's content hash.
+    Later calls memory-map that cache and only decode ``columns``, so
+    startup no longer pays for parsing the .dta. Editing the .dta changes
+    its hash, so a stale cache is never served. Pass ``columns=None`` for
+    every column. ``optional`` columns (e.g. survey weights) are loaded
+    too when the extract has them.
+    """
+    target = cache_path(path, cache_dir)
+    if not target.exists():
+        df = clean_frame(pd.read_stata(path, convert_categoricals=True))
+        write_arrow(df, target)
+        if columns is None:
+            return df
+        return df[list(dict.fromkeys([*columns, *(c for c in optional if c in df.columns)]))]
+    return read_arrow(target, columns, optional)
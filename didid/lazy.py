@@ -0,0 +1,157 @@
+"""Optional lazy backend: ingestion and features as one Polars query plan.
+
+The pandas path materialises a frame for the cleaned extract, then a
+column per derived feature, then the estimator's arrays. Here the race
+filter, the ``'N/A'`` coercion of ``HRSWORK1``, ``part_time``,
+``high_lanham``, the interaction terms and the sample restrictions are
+one lazy plan over the source. Polars pushes the projection and the
+predicates into the scan and runs the plan on all cores, so only the
+columns and rows a model uses are ever decoded. The collected columns
+go to the estimators as plain arrays, and the results are the same as
+with the pandas path.
+
+Sources are Parquet or Arrow IPC files (including the ``.didid_cache``
+conversion), and .dta files, which are converted to that cache once by
+``load_dta_cached`` because Stata files cannot be scanned lazily.
+
+Polars is not a dependency of the notebook; install it to use this
+module (``pixi add polars``).
+"""
+from pathlib import Path
+
+import pandas as pd
+
+from .absorb import absorbed_ols_many, parse_formula
+from .covariance import cluster_columns
+from .ingest import MODEL_COLUMNS, cache_path, load_dta_cached
+from .spec import CLUSTER, FORMULA, MODELS
+
+DERIVED = ['part_time', 'high_lanham', 'treat_post_cont', 'treat_lanham_cont',
+           'post_lanham_cont', 'ddd_cont']
+
+# Category order of high_lanham, as in the notebook
+LANHAM_LEVELS = ['Low Spending', 'High Spending']
+
+
+def _polars():
+    try:
+        import polars as pl
+    except ImportError as exc:
+        raise ImportError('The lazy backend needs polars (pixi add polars)') from exc
+    return pl
+
+
+def scan_extract(source, cache_dir=None):
+    """``pl.LazyFrame`` over a Parquet, Arrow IPC or (via its Arrow cache) Stata extract."""
+    pl = _polars()
+    source = Path(source)
+    suffix = source.suffix.lower()
+    if suffix == '.parquet':
+        return pl.scan_parquet(source)
+    if suffix == '.dta':
+        target = cache_path(source, cache_dir)
+        if not target.exists():
+            load_dta_cached(source, columns=None, cache_dir=cache_dir)
+        return pl.scan_ipc(target)
+    return pl.scan_ipc(source)
+
+
+def feature_plan(lf):
+    """The notebook's cleaning and feature cells as lazy expressions on ``lf``.
+
+    Same definitions as ``clean_frame`` and ``add_features``: rows with
+    ``race == 2`` are dropped (missing race is kept), text ``'N/A'``
+    codes become nulls, and ``high_lanham`` splits at the median of
+    ``rlanham_012`` over the cleaned rows. Only the columns selected
+    downstream are computed.
+    """
+    pl = _polars()
+    schema = lf.collect_schema()
+    text = [c for c, dtype in schema.items()
+            if dtype == pl.String or isinstance(dtype, (pl.Categorical, pl.Enum))]
+    hours = pl.col('HRSWORK1')
+    hours = hours.cast(pl.String).cast(pl.Float64, strict=False) if 'HRSWORK1' in text \
+        else hours.cast(pl.Float64)
+    lanham, treated, post = pl.col('rlanham_012'), pl.col('treated'), pl.col('post')
+    return (
+        lf.filter((pl.col('race') != 2).fill_null(True))
+        .with_columns(
+            [pl.col(c).cast(pl.String).replace('N/A', None) for c in text if c != 'HRSWORK1']
+            + [hours.alias('HRSWORK1')]
+        )
+        .with_columns(
+            part_time=((pl.col('HRSWORK1') >= 1) & (pl.col('HRSWORK1') <= 34))
+            .fill_null(False).cast(pl.Int8),
+            high_lanham=pl.when(lanham > lanham.median())
+            .then(pl.lit('High Spending')).otherwise(pl.lit('Low Spending'))
+            .cast(pl.Enum(LANHAM_LEVELS)),
+            treat_post_cont=treated * post,
+            treat_lanham_cont=treated * lanham,
+            post_lanham_cont=post * lanham,
+            ddd_cont=treated * post * lanham,
+        )
+    )
+
+
+def to_frame(df):
+    """Collected Polars columns as a pandas frame of plain arrays (categoricals kept as such)."""
+    pl = _polars()
+    columns = {}
+    for name, series in zip(df.columns, df.iter_columns()):
+        if series.dtype.is_numeric():
+            # Nulls become NaN, the estimators' missing-value marker
+            columns[name] = series.to_numpy(allow_copy=True)
+        elif isinstance(series.dtype, pl.Enum):
+            codes = series.to_physical().cast(pl.Int64).fill_null(-1).to_numpy()
+            columns[name] = pd.Categorical.from_codes(codes, series.dtype.categories.to_list())
+        else:
+            columns[name] = series.cast(pl.String).to_pandas().astype('category')
+    return pd.DataFrame(columns)
+
+
+def collect_features(source, columns=MODEL_COLUMNS + DERIVED, sample=None, cache_dir=None,
+                     engine='streaming'):
+    """Cleaned extract with derived features, restricted to ``columns`` and ``sample``.
+
+    ``sample`` is a SQL-style restriction such as ``'emp == 1'`` (the
+    ``MODELS`` strings), applied in the plan.
+    """
+    pl = _polars()
+    lf = feature_plan(scan_extract(source, cache_dir))
+    if sample is not None:
+        lf = lf.filter(pl.sql_expr(sample))
+    return to_frame(lf.select(list(dict.fromkeys(columns))).collect(engine=engine))
+
+
+def lazy_fit(source, models=MODELS, formula=FORMULA, cluster=CLUSTER, cache_dir=None,
+             engine='streaming'):
+    """Fit ``models`` from ``source`` with one lazy plan per sample: ``{name: results}``.
+
+    Each sample's plan selects only its outcomes, regressors, fixed
+    effects and cluster, and drops rows missing any of the shared
+    columns, so the scan decodes nothing else. The plans are collected
+    together (``pl.collect_all``) and share the scan. Outcomes with
+    their own missing rows are handled as in ``absorbed_ols_many``.
+    """
+    pl = _polars()
+    _, regressors, fixed_effects = parse_formula(formula)
+    shared = list(dict.fromkeys([*regressors, *fixed_effects, *cluster_columns(cluster)]))
+    base = feature_plan(scan_extract(source, cache_dir))
+    samples = {}
+    for name, (outcome, sample) in models.items():
+        samples.setdefault(sample, []).append((name, outcome))
+
+    plans = []
+    for sample, members in samples.items():
+        lf = base if sample is None else base.filter(pl.sql_expr(sample))
+        outcomes = list(dict.fromkeys(y for _, y in members))
+        plans.append(lf.drop_nulls(shared).select(shared + [y for y in outcomes
+                                                            if y not in shared]))
+    frames = pl.collect_all(plans, engine=engine)
+
+    fits = {}
+    for (sample, members), frame in zip(samples.items(), frames):
+        outcomes = list(dict.fromkeys(y for _, y in members))
+        res = dict(zip(outcomes, absorbed_ols_many(outcomes, formula, to_frame(frame), cluster)))
+        fits.update((name, res[y]) for name, y in members)
+    return {name: fits[name] for name in models}
@@ -0,0 +1,303 @@
+import numpy as np
+import pandas as pd
+
+from .covariance import cluster_correction
+from .results import DiDiDResults
+
+
+class _Levels:
+    """Grow-only mapping from raw category values to dense integer codes."""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self._index = pd.Index(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, raw):
+        codes = self._index.get_indexer(raw)
+        if (codes < 0).any():
+            new = pd.unique(np.asarray(raw)[codes < 0])
+            self.values.extend(new.tolist())
+            self._index = pd.Index(self.values)
+            codes = self._index.get_indexer(raw)
+        return codes
+
+
+def _pad(a, shape):
+    if a.shape == tuple(shape):
+        return a
+    return np.pad(a, [(0, s - c) for c, s in zip(a.shape, shape)])
+
+
+class ClusterMoments:
+    """Per-cluster cross-products of ``[regressors, outcomes]`` with the FE indicators.
+
+    Rows can be added chunk by chunk (``update``) or whole accumulators
+    combined (``merge``). Nothing here grows with the number of rows:
+    the state is one ``(k + levels) x (k + levels)`` block per cluster.
+    Indicator cross-products come from ``np.bincount``, so dummy columns
+    are never built, not even for one chunk. ``fit`` recovers the exact
+    absorbed-FE estimates and cluster-robust covariance of
+    ``AbsorbedDesign`` through Frisch-Waugh-Lovell on the stored blocks.
+    """
+
+    def __init__(self, regressors, outcomes, fixed_effects, cluster):
+        self.regressors = list(regressors)
+        self.outcomes = list(outcomes)
+        self.fixed_effects = list(fixed_effects)
+        self.cluster = cluster
+        # With no fixed effects the intercept is absorbed as a one-level dimension
+        self._dims = self.fixed_effects or [None]
+        self.fe_levels = [_Levels() for _ in self._dims]
+        self.clusters = _Levels()
+        kw = len(self.regressors) + len(self.outcomes)
+        self.n = np.zeros(0)
+        self.WW = np.zeros((0, kw, kw))
+        self.WF = [np.zeros((0, kw, 0)) for _ in self._dims]
+        self.FF = {(d, e): np.zeros((0, 0, 0)) if d != e else np.zeros((0, 0))
+                   for d in range(len(self._dims))
+                   for e in range(d, len(self._dims))}
+
+    @property
+    def columns(self):
+        return self.regressors + self.outcomes
+
+    def _resize(self):
+        G = len(self.clusters)
+        L = [len(lv) for lv in self.fe_levels]
+        kw = len(self.columns)
+        self.n = _pad(self.n, (G,))
+        self.WW = _pad(self.WW, (G, kw, kw))
+        self.WF = [_pad(a, (G, kw, L[d])) for d, a in enumerate(self.WF)]
+        for (d, e), a in self.FF.items():
+            self.FF[d, e] = _pad(a, (G, L[d]) if d == e else (G, L[d], L[e]))
+
+    def update(self, data, mask=None):
+        """Add the rows of ``data`` (within ``mask``) that have every model column present."""
+        used = self.columns + self.fixed_effects + [self.cluster]
+        mask = np.ones(len(data), dtype=bool) if mask is None else np.array(mask, dtype=bool)
+        for col in dict.fromkeys(used):
+            mask &= data[col].notna().to_numpy()
+        if not mask.any():
+            return self
+
+        W = np.column_stack([data[c].to_numpy(dtype=float)[mask] for c in self.columns])
+        cl = self.clusters.encode(data[self.cluster].to_numpy()[mask])
+        fe = [lv.encode(data[f].to_numpy()[mask]) if f is not None
+              else lv.encode(np.zeros(int(mask.sum()), dtype=int))
+              for lv, f in zip(self.fe_levels, self._dims)]
+        self._resize()
+        G = len(self.clusters)
+        L = [len(lv) for lv in self.fe_levels]
+        kw = W.shape[1]
+
+        self.n += np.bincount(cl, minlength=G)
+        for j in range(kw):
+            for k in range(j, kw):
+                s = np.bincount(cl, weights=W[:, j] * W[:, k], minlength=G)
+                self.WW[:, j, k] += s
+                if k != j:
+                    self.WW[:, k, j] += s
+        for d, codes in enumerate(fe):
+            cell = cl * L[d] + codes
+            for j in range(kw):
+                self.WF[d][:, j, :] += np.bincount(
+                    cell, weights=W[:, j], minlength=G * L[d]).reshape(G, L[d])
+            self.FF[d, d] += np.bincount(cell, minlength=G * L[d]).reshape(G, L[d])
+            for e in range(d + 1, len(fe)):
+                pair = (cl * L[d] + codes) * L[e] + fe[e]
+                self.FF[d, e] += np.bincount(
+                    pair, minlength=G * L[d] * L[e]).reshape(G, L[d], L[e])
+        return self
+
+    def merge(self, other):
+        """Fold another accumulator over the same model into this one."""
+        for d, lv in enumerate(other.fe_levels):
+            self.fe_levels[d].encode(np.asarray(lv.values, dtype=object))
+        self.clusters.encode(np.asarray(other.clusters.values, dtype=object))
+        self._resize()
+        cmap = self.clusters.encode(np.asarray(other.clusters.values, dtype=object))
+        fmap = [self.fe_levels[d].encode(np.asarray(lv.values, dtype=object))
+                for d, lv in enumerate(other.fe_levels)]
+        np.add.at(self.n, cmap, other.n)
+        np.add.at(self.WW, cmap, other.WW)
+        for d, a in enumerate(other.WF):
+            self.WF[d][np.ix_(cmap, np.arange(a.shape[1]), fmap[d])] += a
+        for (d, e), a in other.FF.items():
+            if d == e:
+                self.FF[d, d][np.ix_(cmap, fmap[d])] += a
+            else:
+                self.FF[d, e][np.ix_(cmap, fmap[d], fmap[e])] += a
+        return self
+
+    def state(self):
+        """The accumulator as ``(arrays, meta)``: numeric blocks plus JSON-serialisable labels."""
+        arrays = {'n': self.n, 'WW': self.WW}
+        arrays.update({f'WF{d}': a for d, a in enumerate(self.WF)})
+        arrays.update({f'FF{d}_{e}': a for (d, e), a in self.FF.items()})
+        meta = {
+            'regressors': self.regressors, 'outcomes': self.outcomes,
+            'fixed_effects': self.fixed_effects, 'cluster': self.cluster,
+            'fe_levels': [np.asarray(lv.values).tolist() for lv in self.fe_levels],
+            'clusters': np.asarray(self.clusters.values).tolist(),
+        }
+        return arrays, meta
+
+    @classmethod
+    def from_state(cls, arrays, meta):
+        """Rebuild an accumulator saved with ``state``; it can keep taking ``update``/``merge``."""
+        self = cls(meta['regressors'], meta['outcomes'], meta['fixed_effects'], meta['cluster'])
+        self.fe_levels = [_Levels(values) for values in meta['fe_levels']]
+        self.clusters = _Levels(meta['clusters'])
+        self.n = np.asarray(arrays['n'], dtype=float)
+        self.WW = np.asarray(arrays['WW'], dtype=float)
+        self.WF = [np.asarray(arrays[f'WF{d}'], dtype=float) for d in range(len(self._dims))]
+        self.FF = {(d, e): np.asarray(arrays[f'FF{d}_{e}'], dtype=float) for d, e in self.FF}
+        return self
+
+    def cluster_blocks(self):
+        """Per-cluster ``Z'Z`` and ``Z'W`` with ``Z = [regressors, indicators]``.
+
+        The first FE dimension keeps every level (it carries the intercept);
+        later dimensions drop their first level so ``Z`` has full column
+        rank whenever the FE are connected.
+        """
+        k = len(self.regressors)
+        G = len(self.clusters)
+        F_blocks = []
+        keep = [slice(None) if d == 0 else slice(1, None)
+                for d in range(len(self._dims))]
+        for d, a in enumerate(self.WF):
+            F_blocks.append(a[:, :, keep[d]])
+        WF = np.concatenate(F_blocks, axis=2)
+        sizes = [b.shape[2] for b in F_blocks]
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+        f = int(offsets[-1])
+        FF = np.zeros((G, f, f))
+        for (d, e), a in self.FF.items():
+            rd = slice(offsets[d], offsets[d + 1])
+            if d == e:
+                diag = a[:, keep[d]]
+                idx = np.arange(offsets[d], offsets[d + 1])
+                FF[:, idx, idx] = diag
+            else:
+                re_ = slice(offsets[e], offsets[e + 1])
+                block = a[:, keep[d], :][:, :, keep[e]]
+                FF[:, rd, re_] = block
+                FF[:, re_, rd] = block.transpose(0, 2, 1)
+
+        p = k + f
+        ZtZ = np.zeros((G, p, p))
+        ZtZ[:, :k, :k] = self.WW[:, :k, :k]
+        ZtZ[:, :k, k:] = WF[:, :k, :]
+        ZtZ[:, k:, :k] = WF[:, :k, :].transpose(0, 2, 1)
+        ZtZ[:, k:, k:] = FF
+        ZtY = np.concatenate([self.WW[:, :k, k:], WF[:, k:, :].transpose(0, 2, 1)], axis=1)
+        YtY = self.WW[:, k:, k:]
+        # Every row sits in exactly one level of the first dimension
+        Ysum = self.WF[0][:, k:, :].sum(axis=2)
+        return ZtZ, ZtY, YtY, Ysum
+
+    def fe_dof_within(self, keep=None):
+        """Columns of the equivalent dummy expansion, as in ``FixedEffects.dof``.
+
+        Only levels observed in the clusters selected by ``keep`` count.
+        """
+        present = sum(int((self.FF[d, d][keep].sum(axis=0) > 0).sum())
+                      for d in range(len(self._dims)))
+        return present - (len(self._dims) - 1)
+
+    def fit(self, use_correction=True, drop=None):
+        """Absorbed-FE OLS for every outcome, one ``DiDiDResults`` each.
+
+        ``drop`` optionally names clusters whose blocks are left out, which
+        gives leave-cluster-out fits without touching the data again.
+        """
+        n = self.n.copy()
+        if drop is not None:
+            n[self.clusters._index.get_indexer(list(drop))] = 0
+        ZtZ_g, ZtY_g, YtY_g, Ysum_g = self.cluster_blocks()
+        keep = n > 0
+        totals = (ZtZ_g[keep].sum(0), ZtY_g[keep].sum(0), YtY_g[keep].sum(0), Ysum_g[keep].sum(0))
+        return self._fit(ZtZ_g, ZtY_g, n, totals, use_correction)
+
+    def leave_one_out(self, use_correction=True):
+        """``{cluster: {outcome: results}}`` with each cluster left out in turn.
+
+        The blocks and their totals are assembled once; each leave-one-out
+        fit downdates the totals by that cluster's block and re-solves the
+        small normal equations, so all G fits cost far less than one pass
+        over the data.
+        """
+        ZtZ_g, ZtY_g, YtY_g, Ysum_g = self.cluster_blocks()
+        totals = (ZtZ_g.sum(0), ZtY_g.sum(0), YtY_g.sum(0), Ysum_g.sum(0))
+        out = {}
+        for g, label in enumerate(self.clusters.values):
+            n = self.n.copy()
+            n[g] = 0
+            downdated = tuple(t - b[g] for t, b in zip(totals, (ZtZ_g, ZtY_g, YtY_g, Ysum_g)))
+            out[label] = self._fit(ZtZ_g, ZtY_g, n, downdated, use_correction)
+        return out
+
+    def _fit(self, ZtZ_g, ZtY_g, n_g, totals, use_correction):
+        return fit_blocks(ZtZ_g, ZtY_g, n_g, totals, self.regressors, self.outcomes,
+                          len(self.regressors) + self.fe_dof_within(n_g > 0),
+                          self.fixed_effects, use_correction)
+
+
+def fit_blocks(ZtZ_g, ZtY_g, n_g, totals, regressors, outcomes, k_params,
+               fixed_effects=(), use_correction=True):
+    """Solve the absorbed regression from per-cluster blocks (see ``ClusterMoments``).
+
+    ``totals`` are ``(Z'Z, Z'Y, Y'Y, sum(Y))`` over the clusters in use;
+    clusters with ``n_g == 0`` are left out of the scores, so a cluster
+    can be dropped by zeroing its count and downdating the totals
+    without copying any blocks.
+    """
+    k = len(regressors)
+    ZtZ, ZtY, YtY, Ysum = totals
+    nobs = n_g.sum()
+    G = int((n_g > 0).sum())
+
+    # Frisch-Waugh-Lovell: partial the indicator block out of the regressors
+    FF_inv = np.linalg.pinv(ZtZ[k:, k:], hermitian=True)
+    Pi = FF_inv @ ZtZ[k:, :k]
+    pi_y = FF_inv @ ZtY[k:]
+    Sxx = ZtZ[:k, :k] - ZtZ[:k, k:] @ Pi
+    Sxy = ZtY[:k] - ZtZ[:k, k:] @ pi_y
+    Syy = YtY - ZtY[k:].T @ pi_y
+
+    kept = np.diag(Sxx) > 1e-10 * np.maximum(np.diag(ZtZ)[:k], 1e-300)
+    idx = np.flatnonzero(kept)
+    names = [regressors[i] for i in idx]
+    collinear = [regressors[i] for i in np.flatnonzero(~kept)]
+    bread = np.linalg.pinv(Sxx[np.ix_(idx, idx)])
+    beta = bread @ Sxy[idx]
+
+    # Per-cluster scores X~_g' e_g written in terms of the stored blocks;
+    # dropped regressors get a zero coefficient and a zero row in L
+    B = np.zeros((k, beta.shape[1]))
+    B[idx] = beta
+    A = np.vstack([B, pi_y - Pi @ B])
+    L = np.zeros((ZtZ.shape[0], len(idx)))
+    L[idx, np.arange(len(idx))] = 1.0
+    L[k:] = -Pi[:, idx]
+    ssr = np.diag(Syy) - np.einsum('km,km->m', beta, Sxy[idx])
+    tss = np.diag(YtY) - Ysum ** 2 / nobs
+    df_resid = nobs - len(idx) - (k_params - k)
+    in_use = (n_g > 0)[:, None]
+
+    results = {}
+    for m, outcome in enumerate(outcomes):
+        scores = ((ZtY_g[:, :, m] - ZtZ_g @ A[:, m]) @ L) * in_use
+        cov = bread @ (scores.T @ scores) @ bread
+        if use_correction:
+            cov *= cluster_correction(G, nobs, k_params)
+        results[outcome] = DiDiDResults(
+            pd.Series(beta[:, m], index=names), cov, nobs, ssr[m], tss[m],
+            df_resid, outcome, n_groups=G, fixed_effects=fixed_effects,
+            collinear=collinear,
+        )
+    return results
@@ -0,0 +1,136 @@
+"""Pre-aggregated point plots for the DiDiD visualizations.
+
+``sns.catplot(kind='point')`` on the microdata bootstraps a confidence
+interval for every Period x Group x spending-quartile cell, once per
+figure. Every plotted quantity is a cell mean, so one grouped pass
+collecting counts, sums and sums of squares per state x treated x post
+cell (and per sample restriction) is enough. The means and analytic
+intervals of all four figures follow from that small table, and the
+figures are drawn from it.
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from .spec import CLUSTER, MODELS
+from .stream import lanham_quantiles
+
+PANEL_KEYS = ['statefip', 'treated', 'post']
+
+QUARTILE_LABELS = ['Q1: Low Spending', 'Q2: Medium-Low', 'Q3: Medium-High', 'Q4: High Spending']
+PERIODS = {0: '1940 (Pre)', 1: '1950 (Post)'}
+GROUPS = {0: 'Control', 1: 'Treated (Mothers)'}
+
+
+def panel_cells(data, models=MODELS, by=PANEL_KEYS):
+    """Per-cell statistics for every model's outcome and sample, from one grouped pass.
+
+    Each sample restriction in ``models`` becomes a boolean group key
+    (evaluated with ``data.eval``, so nothing is copied) and the
+    full-sample cells are sums over those keys. Returns a frame indexed
+    by ``model`` and ``by`` with columns ``n``, ``sum``, ``sumsq``,
+    ``rows`` (all rows in the cell, for the spending quantiles) and
+    ``rlanham_012``. ``by`` must include the state.
+    """
+    by = list(by)
+    samples = list(dict.fromkeys(s for _, s in models.values() if s is not None))
+    keys = [data[c] for c in by]
+    keys += [data.eval(s).fillna(False).astype(bool).rename(f'_s{i}') for i, s in enumerate(samples)]
+    outcomes = list(dict.fromkeys(y for y, _ in models.values()))
+
+    parts = {'rows': np.ones(len(data), dtype=np.int64)}
+    for y in outcomes:
+        values = pd.to_numeric(data[y], errors='coerce').to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        values = np.where(present, values, 0.0)
+        parts[f'{y}_n'] = present.astype(np.int64)
+        parts[f'{y}_sum'] = values
+        parts[f'{y}_sumsq'] = values * values
+    cells = pd.DataFrame(parts, index=data.index).groupby(keys, observed=True).sum()
+    lanham = data['rlanham_012'].groupby(data[CLUSTER], observed=True).first()
+
+    frames = {}
+    for name, (y, sample) in models.items():
+        sub = cells
+        if sample is not None:
+            flag = f'_s{samples.index(sample)}'
+            sub = sub[sub.index.get_level_values(flag)]
+        sub = sub.groupby(level=by, observed=True).sum()
+        frames[name] = pd.DataFrame({
+            'n': sub[f'{y}_n'], 'sum': sub[f'{y}_sum'], 'sumsq': sub[f'{y}_sumsq'],
+            'rows': sub['rows'],
+        })
+    table = pd.concat(frames, names=['model']).reset_index()
+    table['rlanham_012'] = table[CLUSTER].map(lanham).to_numpy(dtype=float)
+    return table
+
+
+def panel_table(cells, bins=4, labels=QUARTILE_LABELS, level=0.95, cluster=None):
+    """Means and normal confidence intervals per model x Period x Group x spending quantile.
+
+    ``cells`` comes from ``panel_cells``. Spending quantiles use the
+    row-level distribution of ``rlanham_012`` in the full sample, like
+    ``pd.qcut`` on the microdata. Intervals are ``mean +/- z * se`` with
+    the i.i.d. standard error of a mean, or, with ``cluster`` (a key of
+    ``cells``), the clustered one
+    ``sqrt(G / (G - 1) * sum_g (S_g - n_g * mean) ** 2) / n``.
+    """
+    first = cells['model'].iloc[0]
+    state_rows = cells[cells['model'] == first].groupby('rlanham_012')['rows'].sum()
+    edges = lanham_quantiles(state_rows, np.linspace(0, 1, bins + 1))
+    cells = cells.assign(
+        lanham_quartile=pd.cut(cells['rlanham_012'], edges, labels=labels, include_lowest=True),
+        Period=cells['post'].map(PERIODS),
+        Group=cells['treated'].map(GROUPS),
+    )
+    keys = ['model', 'Period', 'Group', 'lanham_quartile']
+    grouped = cells.groupby(keys, observed=True, sort=False)
+    out = grouped[['n', 'sum', 'sumsq']].sum()
+    mean = out['sum'] / out['n']
+    if cluster is None:
+        var = (out['sumsq'] - out['n'] * mean ** 2) / (out['n'] - 1)
+        se = np.sqrt(var.clip(lower=0) / out['n'])
+    else:
+        within = cells.groupby(keys + [cluster], observed=True, sort=False)[['n', 'sum']].sum()
+        m = mean.reindex(within.index.droplevel(cluster)).to_numpy()
+        score = (within['sum'] - within['n'] * m) ** 2
+        meat = score.groupby(level=keys, observed=True, sort=False).sum()
+        G = score.groupby(level=keys, observed=True, sort=False).size()
+        se = np.sqrt(G / (G - 1) * meat) / out['n']
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    table = pd.DataFrame({'n': out['n'], 'mean': mean, 'se': se,
+                          'ci_low': mean - z * se, 'ci_high': mean + z * se})
+    return table.sort_index().reset_index()
+
+
+def point_panels(table, model, title, palette='Set1', height=4, aspect=0.8, capsize=0.1):
+    """``sns.catplot(kind='point')`` of one model from ``panel_table``.
+
+    Each cell is passed to seaborn as its two interval endpoints: their
+    mean is the cell mean (the intervals are symmetric) and the error
+    bar spans them, so the figure matches a catplot of the microdata
+    with the analytic interval in place of the bootstrap.
+    """
+    rows = table[table['model'] == model]
+    ends = pd.concat([rows.assign(_y=rows['ci_low']), rows.assign(_y=rows['ci_high'])])
+    g = sns.catplot(
+        data=ends,
+        x='Period',
+        y='_y',
+        hue='Group',
+        col='lanham_quartile',
+        kind='point',
+        order=list(PERIODS.values()),
+        hue_order=list(GROUPS.values()),
+        estimator='mean',
+        errorbar=lambda v: (v.min(), v.max()),
+        capsize=capsize,
+        palette=palette,
+        height=height,
+        aspect=aspect,
+    )
+    g.set_axis_labels('Period', MODELS[model][0] if model in MODELS else model)
+    g.fig.suptitle(title, y=1.02)
+    return g
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+from statsmodels.iolib.summary2 import Summary, summary_params
+
+
+class _ModelInfo:
+    """Just enough of a statsmodels ``model`` for ``summary_col`` to label columns."""
+
+    def __init__(self, name, endog_names, exog_names):
+        self.name = name
+        self.endog_names = endog_names
+        self.exog_names = exog_names
+
+
+class DiDiDResults:
+    """Fitted coefficients and cluster-robust covariance for one outcome.
+
+    Mirrors the attributes of a statsmodels results instance that the
+    notebook relies on (``params``, ``bse``, ``pvalues``, ``conf_int``,
+    ``summary``) so the objects drop straight into ``summary_col``.
+    Inference uses the normal distribution, as statsmodels does for
+    ``cov_type='cluster'``.
+    """
+
+    def __init__(self, params, cov_params, nobs, ssr, centered_tss, df_resid,
+                 endog_name, model_name='AbsorbedOLS', n_groups=None,
+                 cov_type='cluster', fixed_effects=(), collinear=(), info=None):
+        self.params = pd.Series(params, dtype=float)
+        names = self.params.index
+        self._cov = pd.DataFrame(np.asarray(cov_params), index=names, columns=names)
+        self.nobs = float(nobs)
+        self.ssr = float(ssr)
+        self.centered_tss = float(centered_tss)
+        self.df_resid = float(df_resid)
+        self.df_model = self.nobs - self.df_resid - 1
+        self.n_groups = n_groups
+        self.cov_type = cov_type
+        self.fixed_effects = list(fixed_effects)
+        self.collinear = list(collinear)
+        self.info = dict(info or {})
+        self.model = _ModelInfo(model_name, endog_name, list(names))
+
+    @property
+    def bse(self):
+        return pd.Series(np.sqrt(np.diag(self._cov)), index=self.params.index)
+
+    @property
+    def tvalues(self):
+        return self.params / self.bse
+
+    @property
+    def pvalues(self):
+        return pd.Series(2 * stats.norm.sf(np.abs(self.tvalues)), index=self.params.index)
+
+    @property
+    def rsquared(self):
+        return 1 - self.ssr / self.centered_tss
+
+    @property
+    def rsquared_adj(self):
+        return 1 - (self.nobs - 1) / self.df_resid * (1 - self.rsquared)
+
+    def cov_params(self):
+        return self._cov
+
+    def conf_int(self, alpha=0.05):
+        q = stats.norm.ppf(1 - alpha / 2)
+        return pd.DataFrame({0: self.params - q * self.bse, 1: self.params + q * self.bse})
+
+    def summary(self, alpha=0.05):
+        smry = Summary()
+        head = {
+            'Model:': self.model.name,
+            'Dependent Variable:': self.model.endog_names,
+            'No. Observations:': f'{self.nobs:.0f}',
+            'R-squared:': f'{self.rsquared:.3f}',
+            'Adj. R-squared:': f'{self.rsquared_adj:.3f}',
+            'Covariance Type:': self.cov_type,
+        }
+        if self.n_groups is not None:
+            head['No. Clusters:'] = str(self.n_groups)
+        if self.fixed_effects:
+            head['Absorbed FE:'] = ', '.join(self.fixed_effects)
+        head.update({f'{k}:': str(v) for k, v in self.info.items()})
+        smry.add_dict(head)
+        smry.add_df(summary_params(self, alpha=alpha, use_t=False))
+        if self.collinear:
+            smry.add_text('Dropped (collinear with the fixed effects): '
+                          + ', '.join(self.collinear))
+        return smry
@@ -0,0 +1,50 @@
+"""The DiDiD specification shared by the notebook and the batch helpers."""
+
+# Right-hand side of all four models: continuous Lanham spending, state and age FE
+FORMULA = "rlanham_012 + post + treat_post_cont + treat_lanham_cont + post_lanham_cont + ddd_cont + C(statefip) + C(age)"
+
+# The four models in the comparison table: name -> (outcome, sample restriction)
+# A restriction of None means the full sample; otherwise it is a DataFrame.query string
+MODELS = {
+    'paper_emp': ('emp', None),
+    'paper_hours': ('HRSWORK1', None),
+    'my_pt': ('part_time', 'emp == 1'),
+    'my_hours': ('HRSWORK1', 'emp == 1'),
+}
+
+CLUSTER = 'statefip'
+
+# Regressors built from state-level Lanham spending: name -> columns multiplied into rlanham_012
+LANHAM_TERMS = {
+    'rlanham_012': (),
+    'treat_lanham_cont': ('treated',),
+    'post_lanham_cont': ('post',),
+    'ddd_cont': ('treated', 'post'),
+}
+
+# Robustness grid (didid.grid): each dimension maps a label to its definition.
+# Samples use the same restriction strings as MODELS
+SAMPLES = {'all': None, 'workers': 'emp == 1'}
+
+# Fixed-effect sets; 'a:b' is the interaction of a and b (post marks the 1950 census)
+FE_SETS = {
+    'state+age': ('statefip', 'age'),
+    'state': ('statefip',),
+    'state+age+state_year': ('statefip', 'age', 'statefip:post'),
+}
+
+# Treatment definitions: label -> spending column, or (column, level) for a 0/1 indicator
+TREATMENTS = {
+    'continuous': 'rlanham_012',
+    'high_lanham': ('high_lanham', 'High Spending'),
+}
+
+# Clustering levels, in the form the estimators take: a column, 'a:b' for the intersection of a
+# and b, or a tuple to cluster on each column separately (multi-way; labelled 'a+b' in grid results)
+CLUSTERS = ('statefip', 'statefip:post', ('statefip', 'age'))
+
+# IPUMS person weight and its 80 successive-difference replicates; the replicate
+# variance is 4/80 * sum_r (b_r - b)^2
+WEIGHT = 'perwt'
+REPLICATES = [f'repwtp{r}' for r in range(1, 81)]
+REPLICATE_SCALE = 4 / 80
@@ -0,0 +1,113 @@
+"""Chunk-by-chunk ingestion, feature derivation and estimation.
+
+For extracts too big to hold in memory (the 1940/1950 full-count
+samples), the notebook's ingestion and feature cells are replayed on one
+chunk at a time and each chunk is folded into ``ClusterMoments``
+accumulators, so peak memory is set by ``chunksize`` rather than by the
+size of the file.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+from .absorb import parse_formula
+from .ingest import MODEL_COLUMNS, clean_frame
+from .moments import ClusterMoments
+from .spec import CLUSTER, FORMULA, MODELS
+
+
+def iter_dta_chunks(path, chunksize=250_000, columns=MODEL_COLUMNS):
+    """Yield cleaned chunks of a Stata file (race filter and N/A cleaning applied)."""
+    with pd.read_stata(path, convert_categoricals=True, chunksize=chunksize,
+                       columns=columns) as reader:
+        for chunk in reader:
+            yield clean_frame(chunk)
+
+
+def iter_arrow_chunks(path, columns=MODEL_COLUMNS):
+    """Yield the record batches of an Arrow IPC cache one at a time.
+
+    The cache written by ``load_dta_cached`` is already cleaned, and the
+    file is memory-mapped, so only the current batch is decoded.
+    """
+    with pa.memory_map(str(path), 'r') as mm:
+        reader = pa.ipc.open_file(mm)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(list(columns))
+            yield batch.to_pandas()
+
+
+def add_features(df, lanham_cut=None):
+    """Add the notebook's derived columns to ``df`` in place.
+
+    Same definitions as the feature-engineering and regression cells:
+    numeric ``HRSWORK1``, ``part_time``, ``high_lanham`` and the four
+    interaction terms. ``high_lanham`` splits at a sample-wide value (the
+    notebook uses the median of ``rlanham_012``), which one chunk cannot
+    know, so it is only added when ``lanham_cut`` is given. The DiDiD
+    models do not use it.
+    """
+    df['HRSWORK1'] = pd.to_numeric(df['HRSWORK1'], errors='coerce')
+    df['part_time'] = np.where((df['HRSWORK1'] >= 1) & (df['HRSWORK1'] <= 34), 1, 0)
+    if lanham_cut is not None:
+        df['high_lanham'] = np.where(df['rlanham_012'] > lanham_cut,
+                                     'High Spending', 'Low Spending')
+    return add_interactions(df)
+
+
+def add_interactions(df):
+    """Add the DiDiD interaction terms of the regression cell to ``df`` in place."""
+    df['treat_post_cont'] = df['treated'] * df['post']
+    df['treat_lanham_cont'] = df['treated'] * df['rlanham_012']
+    df['post_lanham_cont'] = df['post'] * df['rlanham_012']
+    df['ddd_cont'] = df['treated'] * df['post'] * df['rlanham_012']
+    return df
+
+
+def lanham_quantiles(value_counts, q):
+    """Row-level quantiles ``q`` of ``rlanham_012`` from its value counts.
+
+    Linear interpolation between order statistics, as in
+    ``df['rlanham_012'].quantile(q)``.
+    """
+    counts = value_counts.dropna().sort_index()
+    cum = counts.cumsum().to_numpy()
+    values = counts.index.to_numpy(dtype=float)
+    pos = np.asarray(q, dtype=float) * (cum[-1] - 1)
+    lo = np.floor(pos)
+    a = values[np.searchsorted(cum, lo, side='right')]
+    b = values[np.searchsorted(cum, np.minimum(lo + 1, cum[-1] - 1), side='right')]
+    return a + (b - a) * (pos - lo)
+
+
+def stream_moments(chunks, models=MODELS, formula=FORMULA, cluster=CLUSTER,
+                   lanham_cut=None):
+    """Fold every chunk into one ``ClusterMoments`` per model.
+
+    ``chunks`` is any iterable of raw (cleaned) frames, e.g.
+    ``iter_dta_chunks(path)``. Each model's sample restriction is applied
+    per chunk before its moments are updated. ``lanham_cut`` is passed to
+    ``add_features``.
+    """
+    _, regressors, fixed_effects = parse_formula(formula)
+    moments = {name: ClusterMoments(regressors, [outcome], fixed_effects, cluster)
+               for name, (outcome, _) in models.items()}
+    for chunk in chunks:
+        add_features(chunk, lanham_cut)
+        for name, (_, sample) in models.items():
+            moments[name].update(chunk if sample is None else chunk.query(sample))
+    return moments
+
+
+def stream_fit(chunks, models=MODELS, formula=FORMULA, cluster=CLUSTER):
+    """Fit every model in ``models`` from a stream of chunks.
+
+    Returns ``{name: DiDiDResults}`` with the same estimates and clustered
+    SEs as ``absorbed_ols`` on the concatenated data.
+    """
+    moments = stream_moments(chunks, models, formula, cluster)
+    return {name: moments[name].fit()[outcome]
+            for name, (outcome, _) in models.items()}
@@ -0,0 +1,202 @@
+"""Survey-weighted DiDiD fits with replicate-weight variance.
+
+The point estimates use the person weight; their variance comes from
+refitting with each replicate weight column and scaling the spread of
+the replicate estimates (``scale * sum_r (b_r - b)^2``; 4/80 for the
+successive-difference replicates IPUMS ships).
+
+No replicate is refit on its own. The weight columns are treated as one
+``rows x (1 + R)`` matrix ``W``, and a single pass over the rows
+accumulates, for every column of ``W`` at once, the weighted
+cross-products of ``[regressors, outcomes]`` with each other and with
+the FE indicators: dense products ``W' (v_j * v_k)`` and sparse
+indicator products ``F' (W * v_j)``. Each replicate's absorbed fit is
+then Frisch-Waugh-Lovell on its small ``(k + levels)`` system, solved
+for all replicates in one batched ``pinv``/``solve``.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .absorb import FixedEffects, column, parse_formula, sample_mask, sample_rows
+from .ingest import BATCH_ROWS
+from .results import DiDiDResults
+from .spec import FORMULA, MODELS, REPLICATE_SCALE, REPLICATES, WEIGHT
+
+
+def _indicator(codes, n_levels):
+    """Sparse ``levels x rows`` indicator matrix of ``codes``."""
+    return sparse.csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))),
+                             shape=(n_levels, len(codes)))
+
+
+def weighted_moments(data, columns, fe, weight_columns, mask, chunk_rows=BATCH_ROWS // 4):
+    """Weighted cross-products of ``columns`` and the FE indicators, one set per weight column.
+
+    ``fe`` holds the codes of the ``mask`` rows (no dimensions means an
+    intercept). Returns ``(VV, VF, FF)`` with leading axis over
+    ``weight_columns``: ``VV`` is ``(R, k, k)``, ``VF[d]`` is
+    ``(R, k, levels_d)`` and ``FF[d, e]`` is ``(R, levels_d)`` on the
+    diagonal and ``(R, levels_d, levels_e)`` off it.
+
+    The indicator sums are taken once per observed combination of FE
+    levels (state x age cell), for all weight columns in one sparse
+    product per chunk, and then added up to each dimension and pair of
+    dimensions.
+    """
+    codes = fe.codes or [np.zeros(int(mask.sum()), dtype=np.intp)]
+    n_levels = fe.n_levels or [1]
+    combined = np.zeros(len(codes[0]), dtype=np.int64)
+    for c, m in zip(codes, n_levels):
+        combined = combined * m + c
+    cell, cell_values = pd.factorize(combined)
+    n_cells = len(cell_values)
+    # Level of every cell in each dimension
+    cell_levels = []
+    for m in reversed(n_levels):
+        cell_levels.append(cell_values % m)
+        cell_values = cell_values // m
+    cell_levels = cell_levels[::-1]
+
+    rows = np.flatnonzero(mask)
+    R, k = len(weight_columns), len(columns)
+    upper = np.triu_indices(k)
+    VV = np.zeros((R, len(upper[0])))
+    cell_sums = np.zeros((n_cells * (k + 1), R))
+    for start in range(0, len(rows), chunk_rows):
+        idx = rows[start:start + chunk_rows]
+        n = len(idx)
+        W = np.ascontiguousarray(np.vstack([column(data, c, idx) for c in weight_columns]).T)
+        V = np.vstack([column(data, c, idx) for c in columns]).T
+        VV += W.T @ (V[:, upper[0]] * V[:, upper[1]])
+        # One sparse product gives every cell's sum of w and of w * v_j, for all weight columns
+        U = np.column_stack([np.ones(n), V])
+        slots = cell[start:start + n, None] * (k + 1) + np.arange(k + 1)
+        A = sparse.csr_matrix((U.ravel(), (slots.ravel(), np.repeat(np.arange(n), k + 1))),
+                              shape=(n_cells * (k + 1), n))
+        cell_sums += A @ W
+    cell_sums = cell_sums.reshape(n_cells, k + 1, R).transpose(2, 1, 0)
+    cell_w, cell_wv = cell_sums[:, 0], np.ascontiguousarray(cell_sums[:, 1:])
+
+    VV_full = np.zeros((R, k, k))
+    VV_full[:, upper[0], upper[1]] = VV
+    VV_full[:, upper[1], upper[0]] = VV
+    VF = [(cell_wv.reshape(R * k, n_cells) @ _indicator(lv, m).T).reshape(R, k, m)
+          for lv, m in zip(cell_levels, n_levels)]
+    FF = {}
+    for d, (ld, md) in enumerate(zip(cell_levels, n_levels)):
+        FF[d, d] = cell_w @ _indicator(ld, md).T
+        for e in range(d + 1, len(codes)):
+            me = n_levels[e]
+            pair = _indicator(ld * me + cell_levels[e], md * me)
+            FF[d, e] = (cell_w @ pair.T).reshape(R, md, me)
+    return VV_full, VF, FF
+
+
+def _assemble(VV, VF, FF, k):
+    """Stacked ``Z'WZ`` and ``Z'WY`` for ``Z = [regressors, FE indicators]``.
+
+    As in ``ClusterMoments.cluster_blocks``, the first FE dimension keeps
+    every level and the others drop their first, so the system has full
+    rank whenever the FE are connected.
+    """
+    R = VV.shape[0]
+    keep = [slice(None)] + [slice(1, None)] * (len(VF) - 1)
+    F_blocks = [a[:, :, keep[d]] for d, a in enumerate(VF)]
+    sizes = [b.shape[2] for b in F_blocks]
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+    f = int(offsets[-1])
+    FFm = np.zeros((R, f, f))
+    for (d, e), a in FF.items():
+        rd = slice(offsets[d], offsets[d + 1])
+        if d == e:
+            idx = np.arange(offsets[d], offsets[d + 1])
+            FFm[:, idx, idx] = a[:, keep[d]]
+        else:
+            re_ = slice(offsets[e], offsets[e + 1])
+            block = a[:, keep[d], :][:, :, keep[e]]
+            FFm[:, rd, re_] = block
+            FFm[:, re_, rd] = block.transpose(0, 2, 1)
+    VFm = np.concatenate(F_blocks, axis=2)
+    return FFm, VFm, VV
+
+
+def survey_ols_many(outcomes, formula, data, weights=WEIGHT,
+                    replicates=REPLICATES, sample=None, scale=REPLICATE_SCALE, mse=True):
+    """Person-weighted absorbed-FE OLS with replicate-weight covariance, for several outcomes.
+
+    ``formula`` is the right-hand side only, as in ``absorbed_ols_many``.
+    The covariance is ``scale * sum_r (b_r - c)(b_r - c)'`` over the
+    ``replicates`` columns, with ``c`` the full-sample estimate
+    (``mse=True``) or the mean of the replicate estimates. Outcomes are
+    grouped by missing-value pattern; each group costs one pass over the
+    rows however many replicates there are. Returns one
+    ``DiDiDResults`` per outcome, in order.
+    """
+    _, regressors, fixed_effects = parse_formula(formula)
+    weight_columns = [weights, *replicates]
+    base = sample_mask(data, dict.fromkeys([*regressors, *fixed_effects, *weight_columns]))
+    base &= sample_rows(data, sample)
+    groups = {}
+    for outcome in outcomes:
+        mask = base & data[outcome].notna().to_numpy()
+        groups.setdefault(np.packbits(mask).tobytes(), (mask, []))[1].append(outcome)
+
+    k = len(regressors)
+    results = {}
+    for mask, members in groups.values():
+        fe = FixedEffects.from_frame(data, fixed_effects, mask)
+        VV, VF, FF = weighted_moments(data, regressors + members, fe, weight_columns, mask)
+        FFm, VFm, VV = _assemble(VV, VF, FF, k)
+
+        # Frisch-Waugh-Lovell for every weight column at once
+        FF_inv = np.linalg.pinv(FFm, hermitian=True)
+        Pi = FF_inv @ VFm.transpose(0, 2, 1)                  # (R, f, k + m)
+        S = VV - VFm @ Pi                                      # partialled cross-products
+        Sxx, Sxy, Syy = S[:, :k, :k], S[:, :k, k:], S[:, k:, k:]
+
+        raw = VV[0, np.arange(k), np.arange(k)]
+        kept = np.diag(Sxx[0]) > 1e-10 * np.maximum(raw, 1e-300)
+        idx = np.flatnonzero(kept)
+        beta = np.linalg.solve(Sxx[:, idx][:, :, idx], Sxy[:, idx])   # (R, kept, m)
+        full, reps = beta[0], beta[1:]
+        centre = full if mse else reps.mean(axis=0)
+
+        # Weighted sums of y and of the weights: the first FE dimension partitions the rows
+        wsum = FF[0, 0][0].sum()
+        ysum = VF[0][0, k:].sum(axis=1)
+        yy = np.diag(VV[0, k:, k:])
+        ssr = np.diag(Syy[0]) - np.einsum('km,km->m', full, Sxy[0][idx])
+        tss = yy - ysum ** 2 / wsum
+        nobs = int(mask.sum())
+        df_resid = nobs - len(idx) - fe.dof
+        names = [regressors[i] for i in idx]
+        collinear = [regressors[i] for i in np.flatnonzero(~kept)]
+        for m, outcome in enumerate(members):
+            dev = reps[:, :, m] - centre[:, m]
+            cov = scale * dev.T @ dev
+            results[outcome] = DiDiDResults(
+                pd.Series(full[:, m], index=names), cov, nobs, ssr[m], tss[m], df_resid,
+                outcome, model_name='SurveyOLS', cov_type='replicate',
+                fixed_effects=fe.names, collinear=collinear,
+                info={'Weight': weights, 'Replicates': len(replicates)},
+            )
+    return [results[y] for y in outcomes]
+
+
+def survey_fit(data, models=MODELS, formula=FORMULA, weights=WEIGHT, replicates=REPLICATES,
+               scale=REPLICATE_SCALE, mse=True):
+    """Weighted fit with replicate covariance for every model: ``{name: results}``.
+
+    Models on the same sample share their passes over the data.
+    """
+    samples = {}
+    for name, (outcome, sample) in models.items():
+        samples.setdefault(sample, []).append((name, outcome))
+    out = {}
+    for sample, members in samples.items():
+        outcomes = list(dict.fromkeys(y for _, y in members))
+        fits = dict(zip(outcomes, survey_ols_many(outcomes, formula, data, weights, replicates,
+                                                  sample, scale, mse)))
+        out.update((name, fits[y]) for name, y in members)
+    return {name: out[name] for name in models}
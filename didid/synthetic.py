@@ -0,0 +1,113 @@
+"""Seeded synthetic extracts in the schema of ``maternal_employment.dta``.
+
+The real extract cannot be shared, so scaling work runs on data drawn
+here instead: the same columns (``statefip``, ``age`` 25-64, ``race``,
+``treated``, ``post``, ``rlanham_012`` constant within state, ``emp`` and
+``HRSWORK1`` with ``'N/A'`` codes), from 10k to 100M rows, generated
+chunk by chunk.
+
+Both planted outcomes follow the DiDiD specification exactly, with
+additive state and age effects, so the four-model fit recovers the
+planted ``ddd_cont`` coefficients (``PLANTED``):
+
+* ``emp`` is a linear probability model, so Model 1 estimates
+  ``EMP_EFFECT``.
+* Hours of the employed are linear with normal noise, so Model 4
+  (workers only) estimates ``HOURS_EFFECT``.
+
+The unconditional hours and the part-time indicator mix the two margins
+and have no single planted value.
+"""
+import numpy as np
+import pandas as pd
+
+from .ingest import BATCH_ROWS
+
+# The 48 contiguous states (FIPS codes), as in the 1940/1950 extract
+STATES = np.array([1, 4, 5, 6, 8, 9, 10, 12, 13, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25,
+                   26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 44,
+                   45, 46, 47, 48, 49, 50, 51, 53, 54, 55, 56], dtype=np.int8)
+AGES = (25, 64)
+
+# Planted DiDiD effects of $1 of per-child Lanham spending
+EMP_EFFECT = 0.002           # employment probability (Model 1)
+HOURS_EFFECT = 0.03          # weekly hours of employed mothers (Model 4)
+PLANTED = {'paper_emp': EMP_EFFECT, 'my_hours': HOURS_EFFECT}
+
+# HRSWORK1 is a labelled variable: hours 0-98 plus the 'N/A' code
+HOURS_LABELS = [str(h) for h in range(99)] + ['N/A']
+NA_SHARE = 0.03
+BLACK_SHARE = 0.1
+
+
+def state_parameters(seed=0):
+    """Per-state spending and outcome shifts, drawn from ``seed``: one row per state."""
+    rng = np.random.default_rng([seed, 0])
+    n = len(STATES)
+    return pd.DataFrame({
+        'statefip': STATES,
+        # Skewed like the real spending measure (interquartile range of about $40)
+        'rlanham_012': np.round(np.minimum(rng.lognormal(np.log(30), 0.9, n), 150), 2),
+        'emp_shift': rng.uniform(-0.04, 0.04, n),
+        'hours_shift': rng.normal(0, 1.5, n),
+        'size': rng.dirichlet(np.full(n, 4.0)),
+    })
+
+
+def synthetic_chunks(n_rows, seed=0, chunk_rows=BATCH_ROWS, emp_effect=EMP_EFFECT,
+                     hours_effect=HOURS_EFFECT):
+    """Yield ``n_rows`` raw rows (before ``clean_frame``) in frames of ``chunk_rows``.
+
+    The same ``seed`` and ``chunk_rows`` give the same rows. About
+    ``BLACK_SHARE`` of the rows have ``race == 2`` and are dropped by
+    ``clean_frame``; ``HRSWORK1`` is categorical with ``'N/A'`` for
+    ``NA_SHARE`` of the rows.
+    """
+    states = state_parameters(seed)
+    lanham = states['rlanham_012'].to_numpy()
+    ages = np.arange(AGES[0], AGES[1] + 1)
+    # Employment and hours are hump-shaped in age; young mothers more often have a child 0-12
+    age_emp = 0.06 * np.exp(-((ages - 42) / 12.0) ** 2)
+    age_hours = 3.0 * np.exp(-((ages - 45) / 15.0) ** 2)
+    p_treated = np.clip(1.1 - ages / 50.0, 0.05, 0.9)
+
+    for i, start in enumerate(range(0, n_rows, chunk_rows)):
+        n = min(chunk_rows, n_rows - start)
+        rng = np.random.default_rng([seed, 1, i])
+        s = rng.choice(len(STATES), n, p=states['size'].to_numpy())
+        a = rng.integers(0, len(ages), n)
+        treated = (rng.random(n) < p_treated[a]).astype(np.int8)
+        post = rng.integers(0, 2, n, dtype=np.int8)
+        L = lanham[s]
+        tp, tl, pl, ddd = treated * post, treated * L, post * L, treated * post * L
+
+        p = (0.12 + states['emp_shift'].to_numpy()[s] + age_emp[a] + 0.08 * post + 0.01 * tp
+             - 0.0002 * tl + 0.0003 * pl + emp_effect * ddd)
+        emp = (rng.random(n) < p).astype(np.int8)
+        hours = (38.0 + states['hours_shift'].to_numpy()[s] + age_hours[a] + 1.5 * post
+                 - 1.0 * tp + 0.005 * tl - 0.01 * pl + hours_effect * ddd
+                 + rng.normal(0, 9.0, n))
+        hours = np.where(emp == 1, np.clip(np.rint(hours), 1, 98), 0).astype(np.int8)
+        hours[rng.random(n) < NA_SHARE] = len(HOURS_LABELS) - 1
+
+        yield pd.DataFrame({
+            'statefip': STATES[s],
+            'age': ages[a].astype(np.int8),
+            'race': np.where(rng.random(n) < BLACK_SHARE, 2, 1).astype(np.int8),
+            'treated': treated,
+            'post': post,
+            'rlanham_012': L,
+            'emp': emp,
+            'HRSWORK1': pd.Categorical.from_codes(hours, HOURS_LABELS),
+        })
+
+
+def synthetic_census(n_rows, seed=0, chunk_rows=BATCH_ROWS, **effects):
+    """All of ``synthetic_chunks`` as one raw frame."""
+    return pd.concat(synthetic_chunks(n_rows, seed, chunk_rows, **effects), ignore_index=True)
+
+
+def write_synthetic_dta(path, n_rows, seed=0, **effects):
+    """Write a synthetic extract as a Stata file (``HRSWORK1`` value-labelled, as in the original)."""
+    synthetic_census(n_rows, seed, **effects).to_stata(path, write_index=False)
+    return path
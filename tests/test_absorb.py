@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.formula.api as smf
+
+from didid.absorb import absorbed_ols
+from didid.ingest import clean_frame
+from didid.spec import FORMULA
+from didid.stream import add_features
+from didid.synthetic import synthetic_census
+
+
+@pytest.fixture(scope='module')
+def data():
+    return add_features(clean_frame(synthetic_census(6_000, seed=1)))
+
+
+@pytest.mark.parametrize('cluster', ['statefip:post', ('statefip', 'statefip:post')])
+def test_state_by_period_clusters_match_statsmodels(data, cluster):
+    formula = f'emp ~ {FORMULA}'
+    res = absorbed_ols(formula, data, cluster=cluster)
+    state = pd.factorize(data['statefip'])[0]
+    state_post = pd.factorize(pd.Series(state * 2 + data['post'].to_numpy()))[0]
+    groups = state_post if isinstance(cluster, str) else np.column_stack([state, state_post])
+    expected = smf.ols(formula, data).fit(cov_type='cluster', cov_kwds={'groups': groups})
+    names = res.params.index
+    np.testing.assert_allclose(res.params, expected.params[names], rtol=1e-8, atol=1e-12)
+    np.testing.assert_allclose(res.bse, expected.bse[names], rtol=1e-8)
+
+
+def test_shared_design_matches_single_outcome_fits(data):
+    from didid.absorb import absorbed_ols_many
+
+    data = data.assign(HRSWORK1=data['HRSWORK1'].where(data['age'] != 30))   # own missing rows
+    outcomes = ['emp', 'HRSWORK1', 'part_time']
+    for sample in [None, 'emp == 1']:
+        rows = data if sample is None else data.query(sample)
+        many = absorbed_ols_many(outcomes, FORMULA, data, 'statefip', sample=sample)
+        for outcome, res in zip(outcomes, many):
+            single = absorbed_ols(f'{outcome} ~ {FORMULA}', rows, cluster='statefip')
+            assert res.nobs == single.nobs
+            np.testing.assert_allclose(res.params, single.params, rtol=1e-10, atol=1e-12)
+            np.testing.assert_allclose(res.bse, single.bse, rtol=1e-10)
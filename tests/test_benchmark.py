@@ -0,0 +1,15 @@
+import numpy as np
+
+from didid.benchmark import bench_size
+
+
+def test_streamed_tier_matches_in_memory(tmp_path):
+    n = 30_000
+    eager_stages, eager = bench_size(n, seed=3, work_dir=tmp_path / 'eager', plots=False)
+    streamed_stages, streamed = bench_size(n, seed=3, work_dir=tmp_path / 'streamed',
+                                           dta_rows=n - 1, plots=False)
+    assert [s['name'] for s in streamed_stages] == ['stream_fits']
+    assert 'fits' in [s['name'] for s in eager_stages]
+    np.testing.assert_allclose(streamed['coef'], eager['coef'], rtol=1e-9)
+    np.testing.assert_allclose(streamed['se'], eager['se'], rtol=1e-9)
+    assert streamed['recovered'].all()
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.formula.api as smf
+
+from didid.bootstrap import WildClusterBootstrap, draw_weights
+from didid.ingest import clean_frame
+from didid.spec import FORMULA
+from didid.stream import add_features
+from didid.synthetic import synthetic_census
+
+
+@pytest.fixture(scope='module')
+def data():
+    return add_features(clean_frame(synthetic_census(6_000, seed=2)))
+
+
+def brute_force_t(data, formula, param, beta0, v):
+    """Bootstrap t-statistic of one weight draw ``v`` by refitting the restricted and full models."""
+    outcome, rhs = formula.split(' ~ ')
+    others = ' + '.join(t for t in rhs.split(' + ') if t != param)
+    frame = data.assign(_y0=data[outcome] - beta0 * data[param])
+    restricted = smf.ols(f'_y0 ~ {others}', frame).fit()
+    codes = pd.factorize(data['statefip'])[0]  # cluster order of the bootstrap
+    frame['_ystar'] = (restricted.fittedvalues + beta0 * data[param]
+                       + v[codes] * restricted.resid)
+    fit = smf.ols(f'_ystar ~ {rhs}', frame).fit(cov_type='cluster', cov_kwds={'groups': codes})
+    return (fit.params[param] - beta0) / fit.bse[param]
+
+
+@pytest.mark.parametrize('beta0', [0.0, 0.003])
+def test_bootstrap_t_matches_brute_force_refits(data, beta0):
+    formula = f'emp ~ {FORMULA}'
+    boot = WildClusterBootstrap.from_formula(formula, data)
+    v = draw_weights(np.random.default_rng(0), 5, boot.n_clusters, 'webb')
+    Mv, Nv = v @ boot.M.T, v @ boot.N.T
+    terms = np.column_stack([v @ boot.a, v @ boot.b, (Mv ** 2).sum(1), (Mv * Nv).sum(1),
+                             (Nv ** 2).sum(1)])
+    expected = [brute_force_t(data, formula, 'ddd_cont', beta0, w) for w in v]
+    np.testing.assert_allclose(boot.t_star(terms, beta0), expected, rtol=1e-9)
+
+
+def test_confidence_interval_inverts_the_test(data):
+    boot = WildClusterBootstrap.from_formula(f'emp ~ {FORMULA}', data)
+    terms = boot.draws(999, seed=0)
+    low, high = boot.confidence_interval(terms, alpha=0.1)
+    assert low < boot.coef < high
+    eps = 1e-6 * boot.se
+    assert boot.p_value(terms, low + eps) >= 0.1 > boot.p_value(terms, low - eps)
+    assert boot.p_value(terms, high - eps) >= 0.1 > boot.p_value(terms, high + eps)
+    assert (boot.p_value(terms) >= 0.1) == (low <= 0 <= high)
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from didid.absorb import absorbed_ols_many
+from didid.cache import ResultCache, cached_ols_many
+from didid.ingest import clean_frame
+from didid.spec import FORMULA
+from didid.stream import add_features
+from didid.synthetic import synthetic_census
+
+
+def test_hit_miss_and_lru_eviction(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=10_000)
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return bytes(4_000) + value
+
+    a = cache.get_or_compute('a', lambda: compute(b'a'))
+    assert cache.get_or_compute('a', lambda: compute(b'a')) == a
+    assert calls == [b'a']                                # second call is a hit
+    time.sleep(0.01)                                      # distinct mtimes on coarse clocks
+    cache.put('b', compute(b'b'))
+    time.sleep(0.01)
+    assert cache.get('a') == a                            # 'a' becomes the most recent entry
+    cache.put('c', compute(b'c'))                         # over max_bytes: 'b' is evicted
+    assert cache.get('b') is None
+    assert cache.get('a') == a and cache.get('c') is not None
+    assert cache.size_bytes <= cache.max_bytes
+
+
+@pytest.mark.parametrize('payload', [b'cdidid.results\nNoSuchResults\n.',   # renamed class
+                                     b'cno_such_module\nResults\n.',        # moved module
+                                     b'\x80\x05'])                           # truncated
+def test_stale_entries_are_misses(tmp_path, payload):
+    cache = ResultCache(tmp_path)
+    cache.directory.mkdir(parents=True, exist_ok=True)
+    cache._path('stale').write_bytes(payload)
+    assert cache.get('stale', 'miss') == 'miss'
+    assert not cache._path('stale').exists()
+    assert cache.get_or_compute('stale', lambda: 42) == 42
+
+
+def test_cached_fit_equals_direct_fit(tmp_path):
+    data = add_features(clean_frame(synthetic_census(4_000, seed=6)))
+    cache = ResultCache(tmp_path)
+    first = cached_ols_many(cache, ['emp', 'HRSWORK1'], FORMULA, data, 'statefip', 'emp == 1')
+    again = cached_ols_many(cache, ['emp', 'HRSWORK1'], FORMULA, data, 'statefip',
+                            data.eval('emp == 1').to_numpy())
+    direct = absorbed_ols_many(['emp', 'HRSWORK1'], FORMULA, data, 'statefip', sample='emp == 1')
+    assert len(cache.entries()) == 1                      # a query and its mask share the entry
+    for a, b, c in zip(first, again, direct):
+        assert a.params.equals(c.params) and b.params.equals(c.params)
+
+
+def test_cached_table_reruns_only_on_new_inputs(tmp_path):
+    from didid.bootstrap import wild_bootstrap_table
+    from didid.cache import cached_table
+
+    data = add_features(clean_frame(synthetic_census(4_000, seed=7)))
+    cache = ResultCache(tmp_path)
+    first = cached_table(cache, wild_bootstrap_table, data, reps=199, seed=1)
+    data['unused'] = 1.0
+    assert cached_table(cache, wild_bootstrap_table, data, reps=199, seed=1).equals(first)
+    assert len(cache.entries()) == 1
+    cached_table(cache, wild_bootstrap_table, data, reps=199, seed=2)
+    assert len(cache.entries()) == 2
+    assert first.equals(wild_bootstrap_table(data, reps=199, seed=1))
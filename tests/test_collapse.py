@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from didid.absorb import absorbed_ols
+from didid.collapse import collapse, collapse_models, collapsed_fit, collapsed_ols
+from didid.ingest import clean_frame
+from didid.spec import FORMULA, MODELS
+from didid.stream import add_features
+from didid.synthetic import synthetic_census
+
+
+@pytest.fixture(scope='module')
+def data():
+    return add_features(clean_frame(synthetic_census(10_000, seed=13)))
+
+
+def test_collapsed_ols_matches_row_level_fit(data):
+    cells = collapse(data, ['emp', 'HRSWORK1'])
+    assert len(cells) < len(data)
+    for outcome in ['emp', 'HRSWORK1']:
+        rows = absorbed_ols(f'{outcome} ~ {FORMULA}', data, cluster='statefip')
+        cell = collapsed_ols(f'{outcome} ~ {FORMULA}', cells)
+        assert cell.nobs == rows.nobs
+        np.testing.assert_allclose(cell.params, rows.params, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(cell.bse, rows.bse, rtol=1e-9)
+        np.testing.assert_allclose(cell.rsquared, rows.rsquared, rtol=1e-9)
+
+
+def test_collapsed_fit_covers_every_model(data):
+    fits = collapsed_fit(collapse_models(data))
+    for name, (outcome, sample) in MODELS.items():
+        rows = data if sample is None else data.query(sample)
+        direct = absorbed_ols(f'{outcome} ~ {FORMULA}', rows, cluster='statefip')
+        np.testing.assert_allclose(fits[name].params, direct.params, rtol=1e-9, atol=1e-12)
+
+
+def test_spending_must_be_constant_within_cells(data):
+    with pytest.raises(ValueError, match='vary within cells'):
+        collapse(data, ['emp'], by=['age', 'treated', 'post'])
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import statsmodels.formula.api as smf
+from scipy.special import expit
+
+from didid.glm import absorbed_glm
+from didid.ingest import clean_frame
+from didid.spec import FORMULA
+from didid.stream import add_features
+from didid.synthetic import synthetic_census
+
+
+def test_interaction_effect_matches_dummy_logit():
+    data = add_features(clean_frame(synthetic_census(8_000, seed=3)))
+    res = absorbed_glm(f'emp ~ {FORMULA}', data, cluster='statefip')
+
+    # Same effect and delta-method SE from statsmodels' dummy-expanded logit
+    groups = pd.factorize(data['statefip'])[0]
+    sm = smf.logit(f'emp ~ {FORMULA}', data).fit(disp=0, cov_type='cluster',
+                                                  cov_kwds={'groups': groups})
+    X, beta = sm.model.exog, sm.params.to_numpy()
+    j = list(sm.params.index).index('ddd_cont')
+    on = data['ddd_cont'].to_numpy() != 0
+
+    def effect(b):
+        eta = X @ b
+        return (expit(eta) - expit(eta - b[j] * X[:, j]))[on].mean()
+
+    grad = np.array([(effect(beta + h) - effect(beta - h)) / 2e-6
+                     for h in np.eye(len(beta)) * 1e-6])
+    total = res.interaction.loc['total']
+    np.testing.assert_allclose(total['effect'], effect(beta), rtol=1e-6)
+    np.testing.assert_allclose(total['Std.Err.'], np.sqrt(grad @ sm.cov_params().to_numpy() @ grad),
+                               rtol=1e-5)
+    per_unit = res.interaction.loc['per unit', 'effect']
+    np.testing.assert_allclose(per_unit, total['effect'] / data.loc[on, 'ddd_cont'].mean())
+
+
+def test_summary_keeps_its_title_and_labels_the_effect_tables():
+    data = add_features(clean_frame(synthetic_census(4_000, seed=4)))
+    res = absorbed_glm(f'emp ~ {FORMULA}', data, cluster='statefip')
+    plain = super(type(res), res).summary()
+    smry = res.summary()
+    assert smry.title == plain.title
+    text = smry.as_text()
+    assert 'Average marginal effects' in text
+    assert 'Interaction effect (ddd_cont)' in text
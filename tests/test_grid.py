@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from didid.absorb import absorbed_ols
+from didid.grid import SpecGrid
+from didid.ingest import clean_frame
+from didid.spec import FORMULA
+from didid.stream import add_features
+from didid.synthetic import synthetic_census
+
+
+@pytest.fixture(scope='module')
+def data():
+    df = add_features(clean_frame(synthetic_census(6_000, seed=5)))
+    df['high_lanham'] = np.where(df['rlanham_012'] > df['rlanham_012'].median(),
+                                 'High Spending', 'Low Spending')
+    return df
+
+
+def test_grid_cell_matches_direct_fit(data):
+    grid = SpecGrid(['emp', 'HRSWORK1'], samples={'all': None},
+                    treatments={'continuous': 'rlanham_012'})
+    results = grid.run(data)
+    row = results.query(outcome='HRSWORK1', fixed_effects='state+age', cluster='statefip').iloc[0]
+    direct = absorbed_ols(f'HRSWORK1 ~ {FORMULA}', data, cluster='statefip')
+    assert row['nobs'] == direct.nobs
+    np.testing.assert_allclose([row['coef'], row['se']],
+                               [direct.params['ddd_cont'], direct.bse['ddd_cont']], rtol=1e-10)
+
+
+def test_process_pool_matches_serial(data):
+    grid = SpecGrid(['emp', 'part_time'], clusters=['statefip'])
+    serial, pooled = grid.run(data).frame, grid.run(data, n_jobs=2).frame
+    pd.testing.assert_frame_equal(serial, pooled)
+
+
+def test_spec_clusterings_work_in_the_estimators_and_the_grid(data):
+    from didid.spec import CLUSTERS
+
+    grid = SpecGrid(['emp'], samples={'all': None}, fixed_effects={'state+age': ('statefip', 'age')},
+                    treatments={'continuous': 'rlanham_012'}, clusters=CLUSTERS)
+    results = grid.run(data)
+    for cluster in CLUSTERS:
+        label = cluster if isinstance(cluster, str) else '+'.join(cluster)
+        row = results.query(cluster=label).iloc[0]
+        direct = absorbed_ols(f'emp ~ {FORMULA}', data, cluster=cluster)
+        np.testing.assert_allclose(row['se'], direct.bse['ddd_cont'], rtol=1e-10)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from didid.absorb import absorbed_ols
+from didid.incremental import IncrementalFit
+from didid.ingest import clean_frame
+from didid.spec import FORMULA, MODELS
+from didid.stream import add_features
+from didid.synthetic import synthetic_census
+
+
+def test_saved_and_merged_fits_match_single_fit(tmp_path):
+    raw = clean_frame(synthetic_census(10_000, seed=19))
+    first, second = raw.iloc[:6_000], raw.iloc[6_000:]
+
+    IncrementalFit().add(first, label='1940').save(tmp_path / 'state.npz')
+    resumed = IncrementalFit.load(tmp_path / 'state.npz')
+    with pytest.raises(ValueError):
+        resumed.add(first, label='1940')
+    resumed.add([second.iloc[:1_500], second.iloc[1_500:]], label='1950')
+
+    merged = IncrementalFit().add(first, label='1940').merge(IncrementalFit().add(second))
+    with pytest.raises(ValueError):
+        merged.merge(IncrementalFit().add(first, label='1940'))
+
+    data = add_features(raw.copy())
+    for inc in (resumed, merged):
+        assert [b['rows'] for b in inc.batches] == [len(first), len(second)]
+        fits = inc.fit()
+        for name, (outcome, sample) in MODELS.items():
+            rows = data if sample is None else data.query(sample)
+            direct = absorbed_ols(f'{outcome} ~ {FORMULA}', rows, cluster='statefip')
+            assert fits[name].nobs == direct.nobs
+            np.testing.assert_allclose(fits[name].params, direct.params, rtol=1e-8, atol=1e-12)
+            np.testing.assert_allclose(fits[name].bse, direct.bse, rtol=1e-7)
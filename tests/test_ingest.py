@@ -0,0 +1,36 @@
+from didid.ingest import clean_frame, load_dta_cached
+from didid.synthetic import synthetic_census, write_synthetic_dta
+
+
+def test_cache_dir_keeps_the_data_directory_clean(tmp_path):
+    data_dir, cache = tmp_path / 'data', tmp_path / 'cache'
+    data_dir.mkdir()
+    path = write_synthetic_dta(data_dir / 'synthetic.dta', 2_000, seed=0)
+    cold = load_dta_cached(path, cache_dir=cache)
+    warm = load_dta_cached(path, cache_dir=cache)
+    assert sorted(p.name for p in data_dir.iterdir()) == ['synthetic.dta']
+    assert len(list(cache.glob('*.digest.json'))) == 1
+    assert cold.equals(warm)
+    assert len(warm) == len(clean_frame(synthetic_census(2_000, seed=0)))
+
+
+def test_compact_frame_keeps_every_estimate():
+    import numpy as np
+
+    from didid.absorb import absorbed_ols_many
+    from didid.ingest import compact_frame, footprint, memory_report
+    from didid.spec import FORMULA
+    from didid.stream import add_features
+
+    loaded = clean_frame(synthetic_census(6_000, seed=10))
+    compact = compact_frame(loaded)
+    assert compact['statefip'].dtype == 'category' and compact['emp'].dtype == np.int8
+    report = memory_report(loaded, compact)
+    assert report.equals(memory_report(footprint(loaded), compact))
+
+    wide = add_features(loaded.copy())
+    narrow = add_features(compact.copy())
+    for a, b in zip(absorbed_ols_many(['emp', 'HRSWORK1'], FORMULA, wide, 'statefip'),
+                    absorbed_ols_many(['emp', 'HRSWORK1'], FORMULA, narrow, 'statefip')):
+        np.testing.assert_allclose(a.params, b.params, rtol=1e-10)
+        np.testing.assert_allclose(a.bse, b.bse, rtol=1e-10)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from didid.absorb import absorbed_ols
+from didid.ingest import clean_frame
+from didid.jackknife import jackknife_summary, jackknife_table
+from didid.spec import FORMULA
+from didid.stream import add_features
+from didid.synthetic import synthetic_census
+
+
+def test_leave_one_out_matches_refit():
+    data = add_features(clean_frame(synthetic_census(8_000, seed=14)))
+    models = {'paper_hours': ('HRSWORK1', None), 'my_pt': ('part_time', 'emp == 1')}
+    table = jackknife_table(data, models)
+    for name, (outcome, sample) in models.items():
+        rows = data if sample is None else data.query(sample)
+        loo = table[table['model'] == name]
+        assert len(loo) == rows['statefip'].nunique()
+        for state in loo['statefip'].iloc[[0, 17, -1]]:
+            refit = absorbed_ols(f'{outcome} ~ {FORMULA}', rows[rows['statefip'] != state],
+                                 cluster='statefip')
+            row = loo[loo['statefip'] == state].iloc[0]
+            np.testing.assert_allclose([row['coef'], row['se']],
+                                       [refit.params['ddd_cont'], refit.bse['ddd_cont']],
+                                       rtol=1e-8)
+
+    summary = jackknife_summary(table)
+    shifts = table.loc[table['model'] == 'my_pt', 'shift']
+    G = len(shifts)
+    np.testing.assert_allclose(summary.loc['my_pt', 'se_cv3'],
+                               np.sqrt((G - 1) / G * (shifts ** 2).sum()))
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from didid.batch import derive_features, fit_models
+from didid.ingest import compact_frame, load_dta_cached
+from didid.synthetic import write_synthetic_dta
+
+pytest.importorskip('polars')
+from didid.lazy import lazy_fit  # noqa: E402
+
+
+def test_lazy_fit_matches_pandas_on_dta(tmp_path):
+    # HRSWORK1 is value-labelled with 'N/A' codes, which become nulls in the
+    # categorical written to the Arrow cache
+    path = write_synthetic_dta(tmp_path / 'synthetic.dta', 20_000, seed=0)
+    cache = tmp_path / 'cache'
+    lazy = lazy_fit(path, cache_dir=cache)
+    eager = fit_models(derive_features(compact_frame(load_dta_cached(path, cache_dir=cache))))
+    assert list(lazy) == list(eager)
+    for name, res in eager.items():
+        assert lazy[name].nobs == res.nobs
+        np.testing.assert_allclose(lazy[name].params, res.params, rtol=1e-10, atol=1e-12)
+        np.testing.assert_allclose(lazy[name].bse, res.bse, rtol=1e-10, atol=1e-12)
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from didid.absorb import absorbed_ols
+from didid.cache import ResultCache, cached_table
+from didid.ingest import clean_frame
+from didid.permutation import PermutationInference, permutation_table
+from didid.spec import FORMULA
+from didid.stream import add_features, add_interactions
+from didid.synthetic import synthetic_census
+
+
+def test_placebo_coefficient_matches_refit_on_permuted_spending():
+    data = add_features(clean_frame(synthetic_census(6_000, seed=8)))
+    perm = PermutationInference.from_formula(f'emp ~ {FORMULA}', data)
+    np.testing.assert_allclose(perm.coef, absorbed_ols(f'emp ~ {FORMULA}', data).params['ddd_cont'],
+                               rtol=1e-9)
+
+    # Reassign the state spending levels by hand and refit
+    states = pd.unique(data['statefip'])
+    spending = data.groupby('statefip')['rlanham_012'].first()
+    shuffled = dict(zip(states, np.random.default_rng(0).permutation(spending[states].to_numpy())))
+    placebo = add_interactions(data.assign(rlanham_012=data['statefip'].map(shuffled)))
+    refit = absorbed_ols(f'emp ~ {FORMULA}', placebo).params['ddd_cont']
+    placebo = perm._coef(np.array([shuffled[s] for s in perm.states]))
+    np.testing.assert_allclose(placebo, refit, rtol=1e-8)
+
+
+def test_cached_permutation_table(tmp_path):
+    data = add_features(clean_frame(synthetic_census(4_000, seed=9)))
+    cache = ResultCache(tmp_path)
+    table = cached_table(cache, permutation_table, data, reps=99, seed=3)
+    assert table.equals(cached_table(cache, permutation_table, data, reps=99, seed=3))
+    assert table.equals(permutation_table(data, reps=99, seed=3))
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from didid.ingest import clean_frame
+from didid.plots import GROUPS, PERIODS, QUARTILE_LABELS, panel_cells, panel_table
+from didid.spec import MODELS
+from didid.stream import add_features
+from didid.synthetic import synthetic_census
+
+
+def test_panel_table_matches_microdata_means():
+    data = add_features(clean_frame(synthetic_census(20_000, seed=15)))
+    table = panel_table(panel_cells(data)).set_index(['model', 'Period', 'Group', 'lanham_quartile'])
+    quartile = pd.qcut(data['rlanham_012'], 4, labels=QUARTILE_LABELS)
+    for name, (outcome, sample) in MODELS.items():
+        mask = pd.Series(True, index=data.index) if sample is None else data.eval(sample)
+        rows = data[mask]
+        direct = rows.groupby([rows['post'].map(PERIODS), rows['treated'].map(GROUPS),
+                               quartile[mask]], observed=True)[outcome].agg(['count', 'mean', 'sem'])
+        got = table.loc[name].loc[direct.index]
+        np.testing.assert_array_equal(got['n'], direct['count'])
+        np.testing.assert_allclose(got['mean'], direct['mean'], rtol=1e-10)
+        np.testing.assert_allclose(got['se'], direct['sem'], rtol=1e-8)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from didid.absorb import absorbed_ols
+from didid.ingest import clean_frame, load_dta_cached
+from didid.spec import FORMULA, MODELS
+from didid.stream import add_features, iter_dta_chunks, stream_fit
+from didid.synthetic import synthetic_census, write_synthetic_dta
+
+
+def test_streamed_fits_match_in_memory_fits():
+    data = clean_frame(synthetic_census(12_000, seed=11))
+    chunks = [data.iloc[i:i + 2_500].reset_index(drop=True) for i in range(0, len(data), 2_500)]
+    streamed = stream_fit(chunks)
+    full = add_features(data.copy())
+    for name, (outcome, sample) in MODELS.items():
+        rows = full if sample is None else full.query(sample)
+        direct = absorbed_ols(f'{outcome} ~ {FORMULA}', rows, cluster='statefip')
+        assert streamed[name].nobs == direct.nobs
+        np.testing.assert_allclose(streamed[name].params, direct.params, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(streamed[name].bse, direct.bse, rtol=1e-9)
+
+
+def test_dta_chunks_are_the_cleaned_extract(tmp_path):
+    path = write_synthetic_dta(tmp_path / 'synthetic.dta', 5_000, seed=12)
+    chunks = list(iter_dta_chunks(path, chunksize=1_500))
+    loaded = load_dta_cached(path, cache_dir=tmp_path / 'cache')
+    assert len(chunks) > 1
+    assert sum(map(len, chunks)) == len(loaded)
+    streamed = stream_fit(iter_dta_chunks(path, chunksize=1_500))
+    direct = absorbed_ols(f'emp ~ {FORMULA}', add_features(loaded), cluster='statefip')
+    np.testing.assert_allclose(streamed['paper_emp'].params, direct.params, rtol=1e-9, atol=1e-12)
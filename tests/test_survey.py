@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from didid.ingest import clean_frame
+from didid.spec import FORMULA
+from didid.stream import add_features
+from didid.survey import survey_ols_many
+from didid.synthetic import synthetic_census
+
+
+def _wls(data, outcome, regressors, weight):
+    X = np.column_stack([data[regressors].to_numpy(float),
+                         pd.get_dummies(data['statefip'], dtype=float),
+                         pd.get_dummies(data['age'], drop_first=True, dtype=float)])
+    w = np.sqrt(data[weight].to_numpy())
+    beta = np.linalg.lstsq(X * w[:, None], data[outcome].to_numpy(float) * w, rcond=None)[0]
+    return beta[:len(regressors)]
+
+
+def test_replicate_fits_match_direct_weighted_fits():
+    data = add_features(clean_frame(synthetic_census(6_000, seed=17)))
+    rng = np.random.default_rng(17)
+    data['perwt'] = rng.uniform(50, 150, len(data))
+    replicates = ['repwtp1', 'repwtp2']
+    for r in replicates:
+        data[r] = data['perwt'] * rng.uniform(0.5, 1.5, len(data))
+
+    emp, hours = survey_ols_many(['emp', 'HRSWORK1'], FORMULA, data, replicates=replicates,
+                                 scale=1.0)
+    for outcome, res in [('emp', emp), ('HRSWORK1', hours)]:
+        rows = data[data[outcome].notna()]
+        names = list(res.params.index)
+        assert 'rlanham_012' not in names      # absorbed by the state effects
+        assert res.nobs == len(rows)
+        full = _wls(rows, outcome, names, 'perwt')
+        reps = np.array([_wls(rows, outcome, names, r) for r in replicates])
+        np.testing.assert_allclose(res.params, full, rtol=1e-8, atol=1e-12)
+        np.testing.assert_allclose(res.cov_params(), (reps - full).T @ (reps - full),
+                                   rtol=1e-6, atol=1e-14)
@@ -0,0 +1,27 @@
+import numpy as np
+
+from didid.absorb import absorbed_ols
+from didid.ingest import clean_frame
+from didid.spec import FORMULA
+from didid.stream import add_features, add_interactions
+from didid.synthetic import synthetic_census
+from didid.threshold import ThresholdSweep
+
+
+def test_sweep_point_matches_refit():
+    data = add_features(clean_frame(synthetic_census(8_000, seed=16)))
+    for outcome, sample in [('HRSWORK1', None), ('part_time', 'emp == 1')]:
+        formula = f'{outcome} ~ {FORMULA}'
+        table = ThresholdSweep.from_formula(formula, data, sample=sample).run()
+        assert table['cutoff'].is_monotonic_increasing
+        for i in [0, len(table) // 2, len(table) - 1]:
+            point = table.iloc[i]
+            binary = add_interactions(data.assign(
+                rlanham_012=(data['rlanham_012'] > point['cutoff']).astype(float)))
+            rows = binary if sample is None else binary.query(sample)
+            refit = absorbed_ols(formula, rows, cluster='statefip')
+            assert point['nobs'] == refit.nobs
+            assert point['high_states'] == rows.loc[rows['rlanham_012'] == 1, 'statefip'].nunique()
+            np.testing.assert_allclose([point['coef'], point['se']],
+                                       [refit.params['ddd_cont'], refit.bse['ddd_cont']],
+                                       rtol=1e-7)